@@ -6,11 +6,47 @@ This program demonstrates concurrent execution using Python's threading module.
 Two arithmetic operations (addition and multiplication) run in parallel on the same inputs.
 
 This shows how threading can improve performance by running independent tasks simultaneously.
+
+The arithmetic runs on a WorkerPool: a fixed set of threads, started once,
+that takes (op, a, b) tasks and hands back a Future for each. An operand
+may itself be a Future, so "multiply the result of an add" is submitted
+up front and runs as soon as the add is done:
+
+    with WorkerPool(workers=4) as pool:
+        total = pool.submit("add", 2, 3)
+        product = pool.submit("mul", total, 10)     # waits for total
+        print(product.result())                     # 50
+        results = pool.map([("add", 1, 2), ("mul", 3, 4)])
+
+add_multiply_benchmark.py compares the pool with starting one thread per
+operation.
+
+Threads cannot speed up the arithmetic itself - the GIL lets only one of
+them run Python code at a time. For large arrays there is a process mode:
+the operands and results live in multiprocessing.shared_memory blocks,
+each worker process attaches to them by name and computes its own slice,
+so no data is pickled or copied between processes:
+
+    python add_multiply.py --mode process --size 20000000 --workers 4
+
+runs the same inputs in thread mode too and reports the speed-up.
 """
 
+import argparse
+import operator
+import os
+import queue
+import random
 import threading
 import time
+from array import array
+from concurrent.futures import Future, ProcessPoolExecutor
 from datetime import datetime
+from multiprocessing import shared_memory
+
+# Operations a task may name; any other callable taking (a, b) works too
+OPERATIONS = {"add": operator.add, "mul": operator.mul}
+
 
 def timestamp():
     return datetime.now().strftime("%H:%M:%S")
@@ -19,30 +55,293 @@ def addition(first_num, second_num):
     print(f"[{timestamp()}] ADDING: {first_num} + {second_num}")
     time.sleep(3)  # Simulate time-consuming calculation
     print(f"[{timestamp()}] SUM: {first_num + second_num}")
+    return first_num + second_num
 
 def multiplication(first_num, second_num):
     print(f"[{timestamp()}] MULTIPLYING: {first_num} * {second_num}")
     time.sleep(3)  # Simulate time-consuming calculation
     print(f"[{timestamp()}] PRODUCT: {first_num * second_num}")
+    return first_num * second_num
+
+
+class WorkerPool:
+    """
+    Fixed-size pool of worker threads for (op, a, b) tasks.
+
+    Threads are started once and reused, so the cost of a task is a queue
+    hand-off rather than creating and joining a thread. Tasks whose
+    operands are unfinished Futures are held back and queued by the
+    callback of the last one to finish; if an operand fails, the
+    dependent task fails with the same exception.
+    """
+
+    def __init__(self, workers=4, chunk_size=256):
+        self.chunk_size = chunk_size
+        self._queue = queue.SimpleQueue()  # Items are lists of ready tasks
+        self._closed = False
+        self._unfinished = 0  # Tasks submitted but not run yet, held ones included
+        self._idle = threading.Condition()
+        self._threads = [threading.Thread(target=self._work, daemon=True)
+                         for _ in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def _work(self):
+        while True:
+            tasks = self._queue.get()
+            if tasks is None:
+                return
+            for future, func, a, b in tasks:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    if isinstance(a, Future):
+                        a = a.result()
+                    if isinstance(b, Future):
+                        b = b.result()
+                    future.set_result(func(a, b))
+                except BaseException as error:
+                    future.set_exception(error)
+            with self._idle:
+                self._unfinished -= len(tasks)
+                if not self._unfinished:
+                    self._idle.notify_all()
+
+    def _prepare(self, op, a, b):
+        """Build a task; returns (task, unfinished operand futures)."""
+        if self._closed:
+            raise RuntimeError("cannot submit to a pool that was shut down")
+        func = OPERATIONS[op] if isinstance(op, str) else op
+        waiting = [operand for operand in (a, b)
+                   if isinstance(operand, Future) and not operand.done()]
+        return (Future(), func, a, b), waiting
+
+    def _started(self, count):
+        with self._idle:
+            self._unfinished += count
+
+    def _hold(self, task, waiting):
+        """Queue task once every future in waiting has finished."""
+        remaining = [len(waiting)]
+        lock = threading.Lock()
+
+        def operand_done(_):
+            with lock:
+                remaining[0] -= 1
+                ready = remaining[0] == 0
+            if ready:
+                self._queue.put([task])
+
+        for operand in waiting:
+            operand.add_done_callback(operand_done)
+
+    def submit(self, op, a, b):
+        """
+        Schedule op(a, b).
+
+        Args:
+            op: "add", "mul" or a callable taking two arguments
+            a, b: Numbers, or Futures from earlier submits
+
+        Returns:
+            Future: Resolves to the result
+        """
+        task, waiting = self._prepare(op, a, b)
+        self._started(1)
+        if waiting:
+            self._hold(task, waiting)
+        else:
+            self._queue.put([task])
+        return task[0]
+
+    def map(self, tasks):
+        """
+        Schedule a batch of (op, a, b) tasks.
+
+        Ready tasks are queued chunk_size at a time, so a big batch costs
+        a few queue hand-offs rather than one per task.
+
+        Returns:
+            list: One Future per task, in order
+        """
+        prepared = [self._prepare(op, a, b) for op, a, b in tasks]
+        self._started(len(prepared))
+        futures = []
+        ready = []
+        for task, waiting in prepared:
+            futures.append(task[0])
+            if waiting:
+                self._hold(task, waiting)
+                continue
+            ready.append(task)
+            if len(ready) >= self.chunk_size:
+                self._queue.put(ready)
+                ready = []
+        if ready:
+            self._queue.put(ready)
+        return futures
+
+    def shutdown(self):
+        """Wait for every submitted task (held ones too), then stop the workers."""
+        if self._closed:
+            return
+        self._closed = True
+        with self._idle:
+            self._idle.wait_for(lambda: not self._unfinished)
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+
+
+class SharedIntArray:
+    """
+    Array of 64-bit integers in a shared memory block.
+
+    .values is a memoryview of the block ('q' format): indexing, slicing
+    and slice assignment work like an array.array, without a copy. Other
+    processes open the same block with SharedIntArray(size, name=...).
+    """
+
+    def __init__(self, size, name=None):
+        self.size = size
+        self._shm = shared_memory.SharedMemory(name=name, create=name is None,
+                                               size=max(8, 8 * size))
+        self.name = self._shm.name
+        self.values = self._shm.buf.cast("q")[:size]
+
+    def close(self):
+        self.values.release()
+        self._shm.close()
+
+    def unlink(self):
+        """Close and free the block (only the creator should do this)."""
+        self.close()
+        self._shm.unlink()
+
+
+# Elements computed per step of a slice, to keep temporary lists small
+_STEP = 1 << 16
+
+# Shared arrays a worker process has already opened, by block name
+_attached = {}
+
+
+def _add_multiply_range(a, b, sums, products, lo, hi):
+    """sums[i] = a[i] + b[i] and products[i] = a[i] * b[i] for lo <= i < hi."""
+    for start in range(lo, hi, _STEP):
+        end = min(start + _STEP, hi)
+        left, right = a[start:end], b[start:end]
+        sums[start:end] = array("q", map(operator.add, left, right))
+        products[start:end] = array("q", map(operator.mul, left, right))
+
+
+def _process_slice(names, size, lo, hi):
+    """Worker-process task: open the shared arrays (once) and do one slice."""
+    views = []
+    for name in names:
+        if name not in _attached:
+            _attached[name] = SharedIntArray(size, name=name)
+        views.append(_attached[name].values)
+    _add_multiply_range(*views, lo, hi)
+    return hi - lo
+
+
+def _slices(size, parts):
+    step = -(-size // parts)
+    return [(lo, min(lo + step, size)) for lo in range(0, size, step)]
+
+
+def add_multiply_arrays(a, b, sums, products, mode="thread", workers=None):
+    """
+    Element-wise sum and product of two SharedIntArrays, written into two more.
+
+    mode "thread" runs the slices on a WorkerPool; mode "process" runs them
+    in worker processes that share the four arrays. Only block names and
+    slice bounds are sent to the workers.
+    """
+    workers = workers or os.cpu_count() or 1
+    size = a.size
+    slices = _slices(size, 4 * workers)
+    if mode == "thread":
+        def run(lo, hi):
+            _add_multiply_range(a.values, b.values, sums.values, products.values, lo, hi)
+        with WorkerPool(workers) as pool:
+            for future in pool.map((run, lo, hi) for lo, hi in slices):
+                future.result()
+    elif mode == "process":
+        names = (a.name, b.name, sums.name, products.name)
+        with ProcessPoolExecutor(workers) as pool:
+            list(pool.map(_process_slice, *zip(*[(names, size, lo, hi) for lo, hi in slices])))
+    else:
+        raise ValueError(f"unknown mode {mode!r}")
+
+
+def run_arrays(size, mode, workers):
+    """Time add_multiply_arrays() on random inputs; compare with threads in process mode."""
+    arrays = [SharedIntArray(size) for _ in range(4)]
+    a, b, sums, products = arrays
+    try:
+        rng = random.Random(0)
+        for start in range(0, size, _STEP):
+            end = min(start + _STEP, size)
+            a.values[start:end] = array("q", (rng.randrange(-2 ** 31, 2 ** 31)
+                                              for _ in range(end - start)))
+            b.values[start:end] = array("q", (rng.randrange(-2 ** 31, 2 ** 31)
+                                              for _ in range(end - start)))
+
+        timings = {}
+        for current in (["thread", "process"] if mode == "process" else ["thread"]):
+            start = time.perf_counter()
+            add_multiply_arrays(a, b, sums, products, current, workers)
+            timings[current] = time.perf_counter() - start
+            check = rng.randrange(size)
+            assert sums.values[check] == a.values[check] + b.values[check]
+            assert products.values[check] == a.values[check] * b.values[check]
+
+        print(f"{size:,} element pairs, {workers} workers")
+        for current, seconds in timings.items():
+            print(f"{current:>7} mode: {seconds:.2f}s")
+        if "process" in timings:
+            print(f"speed-up over threads: {timings['thread'] / timings['process']:.2f}x")
+    finally:
+        for shared in arrays:
+            shared.unlink()
+
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Add and multiply numbers concurrently.")
+    parser.add_argument("--mode", choices=("thread", "process"),
+                        help="add and multiply two large random arrays instead of prompting")
+    parser.add_argument("--size", type=int, default=10_000_000, help="array length")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+    if args.mode:
+        run_arrays(args.size, args.mode, args.workers)
+        raise SystemExit
+
     # Get input from user
     first_num = int(input("Enter the first number: "))
     second_num = int(input("Enter the second number: "))
 
-    # Create two separate threads for addition and multiplication
-    # Each thread will run its target function with the given arguments
-    addition_thread = threading.Thread(target=addition, args=(first_num, second_num))
-    multiplication_thread = threading.Thread(target=multiplication, args=(first_num, second_num))
+    # A pool of two worker threads runs the addition and the multiplication
+    # in parallel; the pool keeps its threads for any further tasks
+    with WorkerPool(workers=2) as pool:
+        total = pool.submit(addition, first_num, second_num)
+        product = pool.submit(multiplication, first_num, second_num)
+
+        # A task can depend on earlier results: it starts once both are ready
+        combined = pool.submit("add", total, product)
 
-    # Start both threads which will run in parallel
-    addition_thread.start()
-    multiplication_thread.start()
+        # Wait for the results before continuing
+        result = combined.result()
+        print(f"[{timestamp()}] Sum + product = {result}")
 
-    # Wait for both threads to complete before continuing
-    # This ensures both operations finish before showing the final message
-    addition_thread.join()
-    multiplication_thread.join()
-    
     # Both operations are now complete
-    print(f"[{timestamp()}] Addition and Multiplication completed.")
\ No newline at end of file
+    print(f"[{timestamp()}] Addition and Multiplication completed.")
@@ -0,0 +1,124 @@
+"""
+Worker Pool Benchmark
+=====================
+Compares two ways of running addition and multiplication over many input
+pairs:
+
+    thread-per-op   the original add_multiply.py approach: a new
+                    threading.Thread for every addition and every
+                    multiplication, all started and then joined
+    pool            one WorkerPool, every task submitted as a batch, plus
+                    a dependent task per pair that multiplies the sum by
+                    the product
+
+Both compute the same results, which are checked against each other.
+"--delay" adds a sleep to every operation to stand in for slow work.
+
+Usage: python add_multiply_benchmark.py --pairs 10000 --workers 8
+"""
+
+import argparse
+import random
+import threading
+import time
+
+from add_multiply import WorkerPool
+
+
+def slow(op, delay):
+    """Wrap op so that it sleeps for delay seconds first (no-op when delay is 0)."""
+    if not delay:
+        return op
+
+    def run(a, b):
+        time.sleep(delay)
+        return op(a, b)
+    return run
+
+
+def thread_per_op(pairs, delay):
+    """
+    Start one thread per addition and per multiplication, then join them all.
+
+    Returns:
+        list: (sum, product, sum * product) per pair
+    """
+    add = slow(lambda a, b: a + b, delay)
+    mul = slow(lambda a, b: a * b, delay)
+    sums = [None] * len(pairs)
+    products = [None] * len(pairs)
+
+    def run(func, out, index, a, b):
+        out[index] = func(a, b)
+
+    threads = []
+    for index, (a, b) in enumerate(pairs):
+        threads.append(threading.Thread(target=run, args=(add, sums, index, a, b)))
+        threads.append(threading.Thread(target=run, args=(mul, products, index, a, b)))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # The combining step needs both results, so it can only start now
+    combined = [None] * len(pairs)
+    threads = [threading.Thread(target=run, args=(mul, combined, index, s, p))
+               for index, (s, p) in enumerate(zip(sums, products))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return list(zip(sums, products, combined))
+
+
+def pooled(pairs, delay, workers):
+    """
+    Submit every operation to one WorkerPool, with the combining step as
+    dependent tasks that run as soon as their two inputs are ready.
+
+    Returns:
+        list: (sum, product, sum * product) per pair
+    """
+    add = slow(lambda a, b: a + b, delay)
+    mul = slow(lambda a, b: a * b, delay)
+    with WorkerPool(workers) as pool:
+        sums = pool.map((add, a, b) for a, b in pairs)
+        products = pool.map((mul, a, b) for a, b in pairs)
+        combined = pool.map((mul, s, p) for s, p in zip(sums, products))
+        return [(s.result(), p.result(), c.result())
+                for s, p, c in zip(sums, products, combined)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pairs", type=int, default=10_000, help="input pairs")
+    parser.add_argument("--workers", type=int, default=8, help="pool size")
+    parser.add_argument("--delay", type=float, default=0.0,
+                        help="seconds each operation sleeps to simulate slow work")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    pairs = [(rng.randint(1, 10 ** 6), rng.randint(1, 10 ** 6)) for _ in range(args.pairs)]
+    operations = 3 * args.pairs
+
+    start = time.perf_counter()
+    expected = thread_per_op(pairs, args.delay)
+    threads_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = pooled(pairs, args.delay, args.workers)
+    pool_seconds = time.perf_counter() - start
+
+    if results != expected:
+        raise RuntimeError("the pool and thread-per-op gave different results")
+    print(f"{args.pairs:,} pairs, {operations:,} operations, delay {args.delay:g}s")
+    print(f"thread-per-op: {threads_seconds:.3f}s ({operations / threads_seconds:,.0f} ops/s, "
+          f"{operations:,} threads)")
+    print(f"pool:          {pool_seconds:.3f}s ({operations / pool_seconds:,.0f} ops/s, "
+          f"{args.workers} threads)")
+    print(f"speed-up: {threads_seconds / pool_seconds:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
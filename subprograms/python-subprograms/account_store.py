@@ -0,0 +1,307 @@
+"""
+Columnar Account Store
+======================
+Keeps millions of accounts as one integer array of balances (in centavos)
+indexed by account id, instead of one BankAccount object per account.
+
+Batch operations (deposit_many / withdraw_many, and apply_many for a mix
+of both) check and apply a whole array of rows at once and report which
+rows went through, following the same rules as BankAccount: amounts must
+be positive and a withdrawal may not overdraw the account.
+store[account_id] gives a BankAccount-style view of a single row.
+
+NumPy is used when it is installed; otherwise the balances live in an
+array.array and batches are applied row by row.
+"""
+
+import threading
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+def _to_centavos(amount):
+    return round(amount * 100)
+
+
+class AccountStore:
+    """
+    ABSTRACTION: Many accounts behind one object
+    Balances are whole centavos in a single int64 column, so an account
+    costs 8 bytes plus its owner name instead of a full Python object
+    """
+
+    def __init__(self):
+        self._owners = []
+        self._size = 0
+        if np is not None:
+            self._balances = np.zeros(1024, dtype=np.int64)
+        else:
+            self._balances = array("q")
+        self._lock = threading.Lock()  # Guards growth and every balance change
+
+    def __len__(self):
+        return self._size
+
+    def open_account(self, owner, balance=0):
+        """Add one account and return its id."""
+        return self.open_accounts([owner], [balance])[0]
+
+    def open_accounts(self, owners, balances):
+        """
+        Add many accounts at once.
+
+        Returns:
+            range: The ids of the new accounts, in the order given
+        """
+        owners = list(owners)
+        centavos = [_to_centavos(balance) for balance in balances]
+        if len(centavos) != len(owners):
+            raise ValueError("owners and balances must have the same length")
+        with self._lock:
+            start = self._size
+            end = start + len(owners)
+            if np is not None:
+                if end > len(self._balances):
+                    grown = np.zeros(max(end, 2 * len(self._balances)), dtype=np.int64)
+                    grown[:start] = self._balances[:start]
+                    self._balances = grown
+                self._balances[start:end] = centavos
+            else:
+                self._balances.extend(centavos)
+            self._owners.extend(owners)
+            self._size = end
+        return range(start, end)
+
+    def owner(self, account_id):
+        self._check_ids([account_id])
+        return self._owners[account_id]
+
+    def get_balance(self, account_id):
+        """Balance of one account in pesos."""
+        self._check_ids([account_id])
+        return int(self._balances[account_id]) / 100
+
+    def balances(self):
+        """Every balance in pesos, indexed by account id."""
+        if np is not None:
+            return self._balances[:self._size] / 100
+        return [centavos / 100 for centavos in self._balances]
+
+    def deposit_many(self, account_ids, amounts):
+        """
+        Deposit amounts[i] into account_ids[i] for every row.
+
+        Returns:
+            Boolean per row (NumPy array or list): True where the deposit
+            went through, False where the amount was not positive
+        """
+        ids, centavos = self._prepare(account_ids, amounts)
+        if np is not None:
+            ok = centavos > 0
+            with self._lock:
+                # add.at handles the same account appearing in several rows
+                np.add.at(self._balances, ids[ok], centavos[ok])
+            return ok
+        ok = [amount > 0 for amount in centavos]
+        with self._lock:
+            for account_id, amount, good in zip(ids, centavos, ok):
+                if good:
+                    self._balances[account_id] += amount
+        return ok
+
+    def withdraw_many(self, account_ids, amounts):
+        """
+        Withdraw amounts[i] from account_ids[i] for every row.
+
+        Rows are judged as if they were applied one after another in order,
+        so two withdrawals from the same account cannot both spend the
+        same money.
+
+        Returns:
+            Boolean per row (NumPy array or list): True where the
+            withdrawal went through, False where the amount was not
+            positive or larger than the balance at that point
+        """
+        ids, centavos = self._prepare(account_ids, amounts)
+        if np is None:
+            ok = []
+            with self._lock:
+                for account_id, amount in zip(ids, centavos):
+                    good = 0 < amount <= self._balances[account_id]
+                    if good:
+                        self._balances[account_id] -= amount
+                    ok.append(good)
+            return ok
+
+        valid = centavos > 0
+        amounts = np.where(valid, centavos, 0)
+        accounts, which, rows_per_account = np.unique(ids, return_inverse=True,
+                                                      return_counts=True)
+        with self._lock:
+            # If everything asked of an account fits in its balance, every
+            # valid row goes through no matter the order - the usual case,
+            # and it needs no per-row work at all
+            totals = np.zeros(len(accounts), dtype=np.int64)
+            np.add.at(totals, which, amounts)
+            balances = self._balances[accounts]
+            fits = totals <= balances
+            self._balances[accounts[fits]] -= totals[fits]
+            ok = valid & fits[which]
+
+            # An account with a single row that does not fit simply fails;
+            # only accounts with several rows and too little money need the
+            # rows played out in order (through a dict, which is far cheaper
+            # per row than indexing the array)
+            replay = ~fits & (rows_per_account > 1)
+            rows = np.flatnonzero(replay[which] & valid)
+            if rows.size:
+                current = dict(zip(accounts[replay].tolist(), balances[replay].tolist()))
+                passed = []
+                for row, account_id, amount in zip(rows.tolist(), ids[rows].tolist(),
+                                                   centavos[rows].tolist()):
+                    if amount <= current[account_id]:
+                        current[account_id] -= amount
+                        passed.append(row)
+                self._balances[list(current)] = list(current.values())
+                ok[passed] = True
+        return ok
+
+    def apply_many(self, account_ids, amounts, deposits):
+        """
+        Apply a mixed batch of deposits and withdrawals in row order.
+
+        Row i is a deposit of amounts[i] when deposits[i] is true and a
+        withdrawal otherwise. Rows are judged as if applied one after
+        another, so a withdrawal can spend money deposited by an earlier
+        row of the same batch but not by a later one.
+
+        Returns:
+            Boolean per row (NumPy array or list): True where the row went
+            through
+        """
+        ids, centavos = self._prepare(account_ids, amounts)
+        if np is None:
+            ok = []
+            with self._lock:
+                for account_id, amount, deposit in zip(ids, centavos, deposits):
+                    if deposit:
+                        good = amount > 0
+                        if good:
+                            self._balances[account_id] += amount
+                    else:
+                        good = 0 < amount <= self._balances[account_id]
+                        if good:
+                            self._balances[account_id] -= amount
+                    ok.append(good)
+            return ok
+
+        deposits = np.asarray(deposits, dtype=bool)
+        valid = centavos > 0
+        if not len(ids):
+            return valid
+        deltas = np.where(valid, np.where(deposits, centavos, -centavos), 0)
+
+        # Group the rows by account (keeping their order inside a group) and
+        # work out each account's balance after every one of its rows
+        order = np.argsort(ids, kind="stable")
+        sorted_ids = ids[order]
+        sorted_deltas = deltas[order]
+        starts = np.flatnonzero(np.r_[True, sorted_ids[1:] != sorted_ids[:-1]])
+        rows_per_account = np.diff(np.r_[starts, len(ids)])
+        accounts = sorted_ids[starts]
+        running = np.cumsum(sorted_deltas)
+        before_group = running[starts] - sorted_deltas[starts]
+        with self._lock:
+            balances = self._balances[accounts]
+            running += np.repeat(balances - before_group, rows_per_account)
+            # An account whose balance never dips below zero takes every valid
+            # row as it stands - the usual case, with no per-row work
+            fits = np.minimum.reduceat(running, starts) >= 0
+            ends = starts + rows_per_account - 1
+            self._balances[accounts[fits]] = running[ends[fits]]
+            ok = valid.copy()
+
+            # Other accounts have their rows played out in order
+            rows = np.sort(order[~np.repeat(fits, rows_per_account)])
+            if rows.size:
+                ok[rows] = False
+                current = dict(zip(accounts[~fits].tolist(), balances[~fits].tolist()))
+                passed = []
+                for row, account_id, amount, deposit in zip(
+                        rows.tolist(), ids[rows].tolist(), centavos[rows].tolist(),
+                        deposits[rows].tolist()):
+                    if amount <= 0:
+                        continue
+                    if deposit:
+                        current[account_id] += amount
+                    elif amount <= current[account_id]:
+                        current[account_id] -= amount
+                    else:
+                        continue
+                    passed.append(row)
+                self._balances[list(current)] = list(current.values())
+                ok[passed] = True
+        return ok
+
+    def _prepare(self, account_ids, amounts):
+        """Validate ids and convert amounts to centavos for a batch."""
+        if np is not None:
+            ids = np.asarray(account_ids, dtype=np.int64)
+            centavos = np.rint(np.asarray(amounts, dtype=np.float64) * 100).astype(np.int64)
+        else:
+            ids = list(account_ids)
+            centavos = [_to_centavos(amount) for amount in amounts]
+        if len(ids) != len(centavos):
+            raise ValueError("account_ids and amounts must have the same length")
+        self._check_ids(ids)
+        return ids, centavos
+
+    def _check_ids(self, ids):
+        if not len(ids):
+            return
+        if np is not None and isinstance(ids, np.ndarray):
+            low, high = ids.min(), ids.max()
+        else:
+            low, high = min(ids), max(ids)
+        if low < 0 or high >= self._size:
+            raise IndexError("unknown account id")
+
+    def __getitem__(self, account_id):
+        self._check_ids([account_id])
+        return AccountView(self, account_id)
+
+
+class AccountView:
+    """
+    ABSTRACTION: One row of an AccountStore that behaves like a BankAccount
+    Same methods, same messages and same True/False results, so code
+    written for BankAccount works on stored accounts unchanged
+    """
+
+    def __init__(self, store, account_id, verbose=True):
+        self._store = store
+        self.account_id = account_id
+        self.verbose = verbose
+
+    @property
+    def owner(self):
+        return self._store.owner(self.account_id)
+
+    def deposit(self, amount):
+        ok = bool(self._store.deposit_many([self.account_id], [amount])[0])
+        if self.verbose:
+            print(f"Deposited ₱{amount}" if ok else "Invalid deposit amount")
+        return ok
+
+    def withdraw(self, amount):
+        ok = bool(self._store.withdraw_many([self.account_id], [amount])[0])
+        if self.verbose:
+            print(f"Withdrew ₱{amount}" if ok else "Insufficient balance or invalid amount")
+        return ok
+
+    def get_balance(self):
+        return self._store.get_balance(self.account_id)
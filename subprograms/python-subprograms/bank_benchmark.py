@@ -0,0 +1,528 @@
+"""
+Bank System Benchmarks
+======================
+Timing scripts for the bank_system module.
+
+Run "python bank_benchmark.py contention" to have many threads hammer
+random transfers between accounts and report transfers per second.
+
+Run "python bank_benchmark.py ledger" to measure durable deposits per
+second through the write-ahead ledger's group commit.
+
+Run "python bank_benchmark.py restart" to build a long transaction history
+and compare restart time from snapshot + log tail against a full replay.
+
+Run "python bank_benchmark.py reads" to measure get_balance() and
+whole-bank snapshot throughput while writer threads keep moving money.
+
+Run "python bank_benchmark.py metrics" to see what the latency histograms
+of bank_metrics cost per call and print the collected percentiles.
+
+Run "python bank_benchmark.py history" to time balance_at() and
+net_flow() queries over a long account history.
+
+Run "python bank_benchmark.py shards" to see how ShardedBank throughput
+changes from 1 to N shard processes.
+
+Run "python bank_benchmark.py registry" to time owner lookups and
+type-ahead search in a Bank registry holding millions of accounts.
+"""
+
+import argparse
+import os
+import random
+import resource
+import statistics
+import tempfile
+import threading
+import time
+
+from bank_ledger import DEPOSIT, OPEN, TRANSFER, TransactionLedger, checkpoint, pack_record, replay
+from bank_metrics import BankMetrics
+from bank_shards import ShardedBank
+from bank_system import Bank, BankAccount, snapshot_balances, transfer
+
+
+def contention(threads, accounts, transfers_per_thread, opening_balance=1000):
+    """
+    Run random transfers from many threads at once.
+
+    Every thread picks two random accounts per transfer, so threads keep
+    colliding on the same locks. The total amount of money is checked
+    afterwards - a lost update or a half-done transfer would change it.
+
+    Returns:
+        tuple: (seconds taken, number of transfers that went through)
+    """
+    bank = [BankAccount(f"Owner {i}", opening_balance, verbose=False) for i in range(accounts)]
+    total_before = sum(account.get_balance() for account in bank)
+    succeeded = [0] * threads
+    start_line = threading.Barrier(threads + 1)
+
+    def worker(index):
+        rng = random.Random(index)
+        ok = 0
+        start_line.wait()
+        for _ in range(transfers_per_thread):
+            src, dst = rng.sample(bank, 2)
+            ok += transfer(src, dst, rng.randint(1, 100))
+        succeeded[index] = ok
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in workers:
+        thread.start()
+    start_line.wait()
+    start = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    seconds = time.perf_counter() - start
+
+    total_after = sum(account.get_balance() for account in bank)
+    if total_after != total_before:
+        raise RuntimeError(f"money was created or lost: {total_before} -> {total_after}")
+    return seconds, sum(succeeded)
+
+
+def ledger_throughput(threads, deposits_per_thread, flush_interval, batch_size):
+    """
+    Time durable deposits from many threads sharing one ledger.
+
+    Returns:
+        tuple: (seconds taken, number of fsyncs the ledger needed)
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        ledger = TransactionLedger(os.path.join(directory, "bench.wal"),
+                                   flush_interval=flush_interval, batch_size=batch_size)
+        accounts = [BankAccount(f"Owner {i}", 0, verbose=False, ledger=ledger)
+                    for i in range(threads)]
+        fsyncs_before = ledger.fsyncs
+
+        def worker(account):
+            for _ in range(deposits_per_thread):
+                account.deposit(1)
+
+        workers = [threading.Thread(target=worker, args=(account,)) for account in accounts]
+        start = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        seconds = time.perf_counter() - start
+        fsyncs = ledger.fsyncs - fsyncs_before
+        ledger.close()
+    return seconds, fsyncs
+
+
+def write_history(path, accounts, transactions, first_seq=1, seed=0):
+    """
+    Append a synthetic history straight to a ledger file.
+
+    Accounts 1..accounts are opened when first_seq is 1; after that the
+    records are random deposits and transfers.
+
+    Returns:
+        int: The next unused sequence number
+    """
+    rng = random.Random(seed)
+    seq = first_seq
+    with open(path, "ab") as f:
+        if first_seq == 1:
+            f.write(b"".join(pack_record(i, OPEN, i, 100000) for i in range(1, accounts + 1)))
+            seq = accounts + 1
+        remaining = transactions
+        while remaining:
+            chunk = []
+            for _ in range(min(remaining, 100000)):
+                if rng.random() < 0.5:
+                    chunk.append(pack_record(seq, DEPOSIT, rng.randint(1, accounts),
+                                             rng.randint(1, 50000)))
+                else:
+                    chunk.append(pack_record(seq, TRANSFER, rng.randint(1, accounts),
+                                             rng.randint(1, 100), rng.randint(1, accounts)))
+                seq += 1
+            f.write(b"".join(chunk))
+            remaining -= len(chunk)
+    return seq
+
+
+def restart_time(transactions, accounts, tail, full_replay):
+    """
+    Time recovery after a long history.
+
+    Writes transactions records, takes a snapshot, appends tail more, and
+    then times replay() from the snapshot (and optionally from scratch).
+
+    Returns:
+        dict: Seconds for the checkpoint, the snapshot restart and (when
+        asked) the full replay
+    """
+    timings = {}
+    with tempfile.TemporaryDirectory() as directory:
+        log = os.path.join(directory, "bank.wal")
+        snap = os.path.join(directory, "bank.snap")
+        seq = write_history(log, accounts, transactions)
+
+        start = time.perf_counter()
+        checkpoint(log, snap)
+        timings["checkpoint"] = time.perf_counter() - start
+
+        write_history(log, accounts, tail, first_seq=seq, seed=1)
+
+        start = time.perf_counter()
+        from_snapshot = replay(log, snap)
+        timings["snapshot restart"] = time.perf_counter() - start
+
+        if full_replay:
+            start = time.perf_counter()
+            from_scratch = replay(log)
+            timings["full replay"] = time.perf_counter() - start
+            if from_scratch != from_snapshot:
+                raise RuntimeError("snapshot restart and full replay disagree")
+    return timings
+
+
+def read_throughput(readers, writers, accounts, seconds, opening_balance=1000):
+    """
+    Poll balances from reader threads while writer threads run transfers.
+
+    Each reader alternates many get_balance() calls with one
+    snapshot_balances() of the whole bank; every snapshot must add up to
+    the money the bank started with.
+
+    Returns:
+        dict: Balance reads, snapshots and transfers completed per second
+    """
+    bank = [BankAccount(f"Owner {i}", opening_balance, verbose=False) for i in range(accounts)]
+    expected = opening_balance * accounts
+    stop = threading.Event()
+    counts = {"reads": 0, "snapshots": 0, "transfers": 0}
+    counts_lock = threading.Lock()
+    errors = []
+
+    def reader(index):
+        rng = random.Random(index)
+        reads = snapshots = 0
+        while not stop.is_set():
+            for account in rng.sample(bank, 100):
+                account.get_balance()
+            reads += 100
+            if sum(snapshot_balances(bank).values()) != expected:
+                errors.append("snapshot total changed")
+            snapshots += 1
+        with counts_lock:
+            counts["reads"] += reads
+            counts["snapshots"] += snapshots
+
+    def writer(index):
+        rng = random.Random(-1 - index)
+        done = 0
+        while not stop.is_set():
+            src, dst = rng.sample(bank, 2)
+            transfer(src, dst, rng.randint(1, 100))
+            done += 1
+        with counts_lock:
+            counts["transfers"] += done
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    threads += [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise RuntimeError(f"inconsistent snapshot: {errors[0]}")
+    return {name: count / seconds for name, count in counts.items()}
+
+
+def metrics_overhead(operations):
+    """
+    Time the same mix of calls on an account without and with metrics.
+
+    Returns:
+        tuple: (nanoseconds per call without metrics, with metrics,
+        the BankMetrics that was filled)
+    """
+    metrics = BankMetrics()
+    per_call = []
+    for attached in (None, metrics):
+        account = BankAccount("Owner", 0, verbose=False, metrics=attached)
+        start = time.perf_counter_ns()
+        for i in range(operations):
+            account.deposit(5)
+            account.withdraw(7 if i % 10 else 0)
+            account.get_balance()
+        per_call.append((time.perf_counter_ns() - start) / (3 * operations))
+    return per_call[0], per_call[1], metrics
+
+
+def history_queries(transactions, queries):
+    """
+    Build a long history on one account and time point-in-time queries.
+
+    Each answer is checked against a replay of the history up to that
+    moment, which is what the index saves.
+
+    Returns:
+        dict: Microseconds per recorded transaction, per balance_at() and
+        per net_flow(), and the milliseconds one full replay takes
+    """
+    clock = [0.0]
+    account = BankAccount("Owner", 1000, verbose=False, history=True)
+    account.history.clock = lambda: clock[0]
+    rng = random.Random(0)
+    changes = []
+    start = time.perf_counter()
+    for _ in range(transactions):
+        clock[0] += rng.random()
+        if rng.random() < 0.5:
+            account.deposit(50)
+            changes.append((clock[0], 50))
+        elif account.withdraw(40):
+            changes.append((clock[0], -40))
+    record = time.perf_counter() - start
+
+    moments = [rng.uniform(0, clock[0]) for _ in range(queries)]
+    start = time.perf_counter()
+    balances = [account.balance_at(moment) for moment in moments]
+    balance_at = time.perf_counter() - start
+    start = time.perf_counter()
+    for moment in moments:
+        account.net_flow(moment / 2, moment)
+    net_flow = time.perf_counter() - start
+
+    start = time.perf_counter()
+    replayed = 1000 + sum(change for when, change in changes if when <= moments[0])
+    replay_ms = (time.perf_counter() - start) * 1e3
+    if replayed != balances[0]:
+        raise RuntimeError(f"balance_at gave {balances[0]}, replay gave {replayed}")
+    return {
+        "record us": record / transactions * 1e6,
+        "balance_at us": balance_at / queries * 1e6,
+        "net_flow us": net_flow / queries * 1e6,
+        "replay ms": replay_ms,
+    }
+
+
+def shard_scaling(max_shards, accounts, batches, batch_size, opening_balance=1000):
+    """
+    Run the same random workload on ShardedBank with 1..max_shards shards.
+
+    The workload is 40% deposits, 40% transfers and 20% balance reads, in
+    batches of batch_size. Afterwards the total money must equal the
+    opening balances plus the deposits that went through.
+
+    Returns:
+        list: One (shards, seconds, operations per second, speed-up) tuple
+        per shard count, with speed-up measured against one shard
+    """
+    rng = random.Random(0)
+    workload = []
+    for _ in range(batches):
+        batch = []
+        for _ in range(batch_size):
+            roll = rng.random()
+            if roll < 0.4:
+                batch.append(("deposit", rng.randint(1, accounts), rng.randint(1, 100)))
+            elif roll < 0.8:
+                batch.append(("transfer", rng.randint(1, accounts), rng.randint(1, accounts),
+                              rng.randint(1, 100)))
+            else:
+                batch.append(("balance", rng.randint(1, accounts)))
+        workload.append(batch)
+
+    rows = []
+    baseline = None
+    for shards in range(1, max_shards + 1):
+        with ShardedBank(shards) as bank:
+            ids = bank.open_accounts((f"Owner {i}", opening_balance) for i in range(accounts))
+            deposited = 0
+            start = time.perf_counter()
+            for batch in workload:
+                for operation, ok in zip(batch, bank.execute(batch)):
+                    if operation[0] == "deposit" and ok:
+                        deposited += operation[2]
+            seconds = time.perf_counter() - start
+            total = sum(bank.execute([("balance", account_id) for account_id in ids]))
+        if total != opening_balance * accounts + deposited:
+            raise RuntimeError(f"{shards} shards: money was created or lost")
+        baseline = baseline or seconds
+        rows.append((shards, seconds, batches * batch_size / seconds, baseline / seconds))
+    return rows
+
+
+FIRST_NAMES = ("Mark", "Ana", "Jose", "Maria", "Juan", "Luz", "Pedro", "Rosa", "Carlo",
+               "Elena", "Miguel", "Sofia", "Andres", "Clara", "Ramon", "Teresa", "Paolo",
+               "Lorna", "Diego", "Isabel")
+LAST_NAMES = ("Cruz", "Reyes", "Santos", "Garcia", "Mendoza", "Bautista", "Aquino",
+              "Ramos", "Torres", "Flores", "Villanueva", "Castillo", "Navarro", "Dizon",
+              "Salazar", "Manalo", "Pascual", "Domingo", "Fernandez", "Lopez")
+
+
+def registry_lookups(accounts, lookups):
+    """
+    Fill a Bank with accounts and time find_owner() and search().
+
+    Owner names are random first name + middle initial + last name + a
+    number, so most names are shared by a handful of accounts.
+
+    Returns:
+        dict: Build seconds, resident memory per account and the median
+        and p99 latency (microseconds) of each kind of lookup
+    """
+    rng = random.Random(0)
+
+    def name():
+        return (f"{rng.choice(FIRST_NAMES)} {chr(65 + rng.randrange(26))}. "
+                f"{rng.choice(LAST_NAMES)} {rng.randrange(1000)}")
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    bank = Bank()
+    start = time.perf_counter()
+    for _ in range(accounts):
+        bank.open_account(name(), 100)
+    build = time.perf_counter() - start
+    rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    def latencies(func, queries):
+        samples = []
+        for query in queries:
+            start = time.perf_counter_ns()
+            func(query)
+            samples.append((time.perf_counter_ns() - start) / 1e3)
+        samples.sort()
+        return statistics.median(samples), samples[int(len(samples) * 0.99)]
+
+    names = [name() for _ in range(lookups)]
+    prefixes = [query[:rng.randint(1, 8)] for query in names]
+    return {
+        "build seconds": build,
+        "bytes per account": (rss_after - rss_before) * 1024 / accounts,
+        "find_owner": latencies(bank.find_owner, names),
+        "search": latencies(bank.search, prefixes),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    contend = commands.add_parser("contention", help="threads hammering random transfers")
+    contend.add_argument("--threads", type=int, default=64)
+    contend.add_argument("--accounts", type=int, default=10000)
+    contend.add_argument("--transfers", type=int, default=5000, help="transfers per thread")
+
+    wal = commands.add_parser("ledger", help="durable deposits through the write-ahead ledger")
+    wal.add_argument("--threads", type=int, default=256)
+    wal.add_argument("--deposits", type=int, default=200, help="deposits per thread")
+    wal.add_argument("--flush-interval", type=float, default=0.005)
+    wal.add_argument("--batch-size", type=int, default=1024)
+
+    restart = commands.add_parser("restart", help="restart time from snapshot vs full replay")
+    restart.add_argument("--transactions", type=int, default=10_000_000,
+                         help="history length before the snapshot")
+    restart.add_argument("--accounts", type=int, default=100_000)
+    restart.add_argument("--tail", type=int, default=10_000,
+                         help="records written after the snapshot")
+    restart.add_argument("--full-replay", action="store_true",
+                         help="also time replaying the whole log (slow)")
+
+    reads = commands.add_parser("reads", help="balance reads and snapshots during transfers")
+    reads.add_argument("--readers", type=int, default=8)
+    reads.add_argument("--writers", type=int, default=8)
+    reads.add_argument("--accounts", type=int, default=1000)
+    reads.add_argument("--seconds", type=float, default=5.0)
+
+    overhead = commands.add_parser("metrics", help="cost of recording latency metrics")
+    overhead.add_argument("--operations", type=int, default=200_000,
+                          help="rounds of deposit + withdraw + get_balance")
+    overhead.add_argument("--prometheus", action="store_true",
+                          help="print the Prometheus export instead of percentiles")
+
+    audit = commands.add_parser("history", help="point-in-time balance queries")
+    audit.add_argument("--transactions", type=int, default=1_000_000)
+    audit.add_argument("--queries", type=int, default=100_000)
+
+    sharded = commands.add_parser("shards", help="ShardedBank throughput per shard count")
+    sharded.add_argument("--max-shards", type=int, default=os.cpu_count() or 1)
+    sharded.add_argument("--accounts", type=int, default=100_000)
+    sharded.add_argument("--batches", type=int, default=100)
+    sharded.add_argument("--batch-size", type=int, default=10_000)
+
+    registry = commands.add_parser("registry", help="owner lookups in a Bank registry")
+    registry.add_argument("--accounts", type=int, default=1_000_000)
+    registry.add_argument("--lookups", type=int, default=10_000)
+
+    args = parser.parse_args()
+
+    if args.command == "contention":
+        seconds, succeeded = contention(args.threads, args.accounts, args.transfers)
+        attempted = args.threads * args.transfers
+        print(f"{args.threads} threads, {args.accounts} accounts: {attempted} transfers "
+              f"({succeeded} succeeded) in {seconds:.2f}s")
+        print(f"throughput: {attempted / seconds:,.0f} transfers/s, balances conserved")
+
+    elif args.command == "ledger":
+        seconds, fsyncs = ledger_throughput(args.threads, args.deposits,
+                                            args.flush_interval, args.batch_size)
+        operations = args.threads * args.deposits
+        print(f"{operations} durable deposits from {args.threads} threads in {seconds:.2f}s")
+        print(f"throughput: {operations / seconds:,.0f} ops/s, {fsyncs} fsyncs "
+              f"({operations / max(fsyncs, 1):.0f} ops per fsync)")
+
+    elif args.command == "restart":
+        print(f"History: {args.transactions:,} transactions over {args.accounts:,} accounts, "
+              f"{args.tail:,} more after the snapshot")
+        timings = restart_time(args.transactions, args.accounts, args.tail, args.full_replay)
+        for name, seconds in timings.items():
+            print(f"{name:>17}: {seconds:.2f}s")
+
+    elif args.command == "reads":
+        rates = read_throughput(args.readers, args.writers, args.accounts, args.seconds)
+        print(f"{args.readers} readers, {args.writers} writers, {args.accounts} accounts "
+              f"for {args.seconds:g}s")
+        print(f"balance reads: {rates['reads']:,.0f}/s, snapshots: {rates['snapshots']:,.0f}/s "
+              f"(all consistent), transfers: {rates['transfers']:,.0f}/s")
+
+    elif args.command == "metrics":
+        plain, measured, metrics = metrics_overhead(args.operations)
+        print(f"per call: {plain:.0f} ns without metrics, {measured:.0f} ns with "
+              f"(+{measured - plain:.0f} ns)")
+        if args.prometheus:
+            print(metrics.to_prometheus(), end="")
+        else:
+            for operation, outcomes in metrics.to_json().items():
+                for outcome, summary in outcomes.items():
+                    print(f"{operation:>11} {outcome:<20} n={summary['count']:<8} "
+                          f"p50={summary['p50'] * 1e9:.0f}ns p99={summary['p99'] * 1e9:.0f}ns "
+                          f"p99.9={summary['p999'] * 1e9:.0f}ns")
+
+    elif args.command == "history":
+        timings = history_queries(args.transactions, args.queries)
+        print(f"{args.transactions:,} transactions, {args.queries:,} queries")
+        print(f"recording: {timings['record us']:.2f} us/transaction")
+        print(f"balance_at: {timings['balance_at us']:.2f} us, "
+              f"net_flow: {timings['net_flow us']:.2f} us per query "
+              f"(one replay instead: {timings['replay ms']:.1f} ms)")
+
+    elif args.command == "shards":
+        print(f"{args.batches} batches of {args.batch_size} operations "
+              f"over {args.accounts:,} accounts, money conserved")
+        print(f"{'shards':>6}  {'seconds':>8}  {'ops/s':>10}  {'speed-up':>8}")
+        for shards, seconds, rate, speedup in shard_scaling(args.max_shards, args.accounts,
+                                                            args.batches, args.batch_size):
+            print(f"{shards:>6}  {seconds:>8.2f}  {rate:>10,.0f}  {speedup:>7.2f}x")
+
+    elif args.command == "registry":
+        result = registry_lookups(args.accounts, args.lookups)
+        print(f"{args.accounts:,} accounts registered in {result['build seconds']:.1f}s "
+              f"(~{result['bytes per account']:.0f} bytes each, indexes included)")
+        for kind in ("find_owner", "search"):
+            median, p99 = result[kind]
+            print(f"{kind:>10}: median {median:.1f} us, p99 {p99:.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""
+Transaction Deduplication
+=========================
+Remembers which transaction ids have already been applied, so a retried
+deposit or withdrawal is not applied twice.
+
+Two structures work together:
+
+    BloomFilter   a bit array that answers "definitely new" or "maybe
+                  seen" for every id ever recorded, in a fixed amount of
+                  memory (about 1.8 bytes per id at a 0.1% error rate)
+    RecentIds     the exact ids of the most recent transactions, bounded
+                  in size (oldest forgotten first)
+
+A new id - the common case - is settled by the Bloom filter alone: one
+hash and a few bit probes, with no lookup in the big exact set. Only
+when the filter says "maybe" is the exact set asked. An id found there
+is a duplicate; an id the filter remembers but the exact set does not is
+either a Bloom false positive or a retry older than the recent window,
+and is treated as new (counted in stats as "unsure") - a bank must never
+refuse a real deposit because of a hash collision.
+
+Pass a Deduplicator as dedup= to BankAccount and give deposit() and
+withdraw() a txn_id. Run this file to measure the false-positive rate
+and memory of the index at 100M ids.
+
+Usage: python bank_dedup.py --ids 100000000 --error-rate 0.001
+"""
+
+import argparse
+import hashlib
+import math
+import sys
+import threading
+import time
+import tracemalloc
+from collections import deque
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+_MASK = (1 << 64) - 1
+
+
+def _mix(x):
+    """splitmix64 finaliser: spreads any 64-bit key over all 64 bits."""
+    x = (x + 0x9E3779B97F4A7C15) & _MASK
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & _MASK
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & _MASK
+    return x ^ (x >> 31)
+
+
+def _key(txn_id):
+    """Map a transaction id (int, str or bytes) to a 64-bit integer."""
+    if isinstance(txn_id, int):
+        return txn_id & _MASK
+    if isinstance(txn_id, str):
+        txn_id = txn_id.encode()
+    return int.from_bytes(hashlib.blake2b(txn_id, digest_size=8).digest(), "little")
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter sized for capacity ids at error_rate.
+
+    Bit positions come from double hashing (h1 + i * h2) of one 64-bit
+    hash per id, so an id is hashed once however many bits it sets.
+    """
+
+    def __init__(self, capacity, error_rate=0.001):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.bits = max(64, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.bits / capacity * math.log(2)))
+        self._array = bytearray((self.bits + 7) // 8)
+
+    @property
+    def nbytes(self):
+        return len(self._array)
+
+    def _positions(self, key):
+        h1 = _mix(key)
+        h2 = _mix(key ^ 0x5851F42D4C957F2D) | 1
+        bits = self.bits
+        return [((h1 + i * h2) & _MASK) % bits for i in range(self.hashes)]
+
+    def add(self, txn_id):
+        array = self._array
+        for position in self._positions(_key(txn_id)):
+            array[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, txn_id):
+        array = self._array
+        h1 = _mix(key := _key(txn_id))
+        h2 = _mix(key ^ 0x5851F42D4C957F2D) | 1
+        for i in range(self.hashes):
+            position = ((h1 + i * h2) & _MASK) % self.bits
+            if not array[position >> 3] & (1 << (position & 7)):
+                return False  # Most new ids stop at the first or second probe
+        return True
+
+    def _positions_many(self, keys):
+        """NumPy version of _positions for an array of uint64 keys (one row per hash)."""
+        def mix(x):
+            x = x + np.uint64(0x9E3779B97F4A7C15)
+            x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+            x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+            return x ^ (x >> np.uint64(31))
+
+        h1 = mix(keys)
+        h2 = mix(keys ^ np.uint64(0x5851F42D4C957F2D)) | np.uint64(1)
+        bits = np.uint64(self.bits)
+        for i in range(self.hashes):
+            yield (h1 + np.uint64(i) * h2) % bits
+
+    def add_many(self, txn_ids):
+        """Add an array of integer ids at once (needs NumPy)."""
+        array = np.frombuffer(self._array, dtype=np.uint8)
+        keys = np.asarray(txn_ids).astype(np.uint64)
+        for positions in self._positions_many(keys):
+            np.bitwise_or.at(array, positions >> np.uint64(3),
+                             np.left_shift(1, positions & np.uint64(7)).astype(np.uint8))
+
+    def contains_many(self, txn_ids):
+        """Membership of an array of integer ids (needs NumPy)."""
+        array = np.frombuffer(self._array, dtype=np.uint8)
+        keys = np.asarray(txn_ids).astype(np.uint64)
+        found = np.ones(len(keys), dtype=bool)
+        for positions in self._positions_many(keys):
+            found &= (array[positions >> np.uint64(3)]
+                      >> (positions & np.uint64(7)).astype(np.uint8)) & np.uint8(1) == 1
+        return found
+
+
+class RecentIds:
+    """Exact set of the last maxsize ids added; the oldest is forgotten first."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._ids = set()
+        self._order = deque()
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, txn_id):
+        return txn_id in self._ids
+
+    def add(self, txn_id):
+        if txn_id in self._ids:
+            return
+        if len(self._order) >= self.maxsize:
+            self._ids.discard(self._order.popleft())
+        self._ids.add(txn_id)
+        self._order.append(txn_id)
+
+
+class Deduplicator:
+    """
+    Bloom filter in front of a bounded exact set of recent ids.
+
+    seen(txn_id) says whether a transaction was already applied;
+    record(txn_id) marks it applied. BankAccount calls both while holding
+    the account lock, and only records operations that went through, so a
+    rejected withdrawal can be retried with the same id.
+    """
+
+    def __init__(self, capacity=10_000_000, error_rate=0.001, recent=1_000_000):
+        self.bloom = BloomFilter(capacity, error_rate)
+        self.recent = RecentIds(recent)
+        self._lock = threading.Lock()
+        self.stats = {"new": 0, "duplicate": 0, "unsure": 0}
+
+    def seen(self, txn_id):
+        with self._lock:
+            if txn_id not in self.bloom:
+                self.stats["new"] += 1
+                return False
+            if txn_id in self.recent:
+                self.stats["duplicate"] += 1
+                return True
+            self.stats["unsure"] += 1  # False positive or a very old retry
+            return False
+
+    def record(self, txn_id):
+        with self._lock:
+            self.bloom.add(txn_id)
+            self.recent.add(txn_id)
+
+
+def measure(ids, error_rate, recent, probes, chunk=1 << 20):
+    """
+    Fill a Bloom filter with ids integers and measure it.
+
+    Ids 0..ids-1 are added; ids..ids+probes-1, never added, are then
+    looked up to count false positives. The exact set's memory is
+    measured with tracemalloc on a filled RecentIds.
+
+    Returns:
+        dict: Sizes in bytes, observed and target false-positive rate and
+        timings
+    """
+    bloom = BloomFilter(ids, error_rate)
+    start = time.perf_counter()
+    for low in range(0, ids, chunk):
+        bloom.add_many(np.arange(low, min(low + chunk, ids), dtype=np.uint64))
+    fill_seconds = time.perf_counter() - start
+
+    false_positives = 0
+    for low in range(ids, ids + probes, chunk):
+        false_positives += int(bloom.contains_many(
+            np.arange(low, min(low + chunk, ids + probes), dtype=np.uint64)).sum())
+
+    sample = list(range(ids, ids + 1000))
+    start = time.perf_counter()
+    for txn_id in sample:
+        txn_id in bloom
+    probe_seconds = (time.perf_counter() - start) / len(sample)
+
+    tracemalloc.start()
+    window = RecentIds(recent)
+    for txn_id in range(recent):
+        window.add(txn_id)
+    recent_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    return {
+        "bloom_bytes": bloom.nbytes,
+        "hashes": bloom.hashes,
+        "recent_bytes": recent_bytes,
+        "false_positive_rate": false_positives / probes,
+        "target_rate": error_rate,
+        "fill_seconds": fill_seconds,
+        "probe_us": probe_seconds * 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the dedup index at scale.")
+    parser.add_argument("--ids", type=int, default=100_000_000, help="ids to add")
+    parser.add_argument("--error-rate", type=float, default=0.001)
+    parser.add_argument("--recent", type=int, default=1_000_000,
+                        help="size of the exact recent-id window")
+    parser.add_argument("--probes", type=int, default=10_000_000,
+                        help="never-added ids looked up to count false positives")
+    args = parser.parse_args()
+    if np is None:
+        sys.exit("the measurement needs NumPy")
+
+    result = measure(args.ids, args.error_rate, args.recent, args.probes)
+    print(f"{args.ids:,} ids, target false-positive rate {args.error_rate:g}")
+    print(f"Bloom filter: {result['bloom_bytes'] / 2 ** 20:,.1f} MiB "
+          f"({result['bloom_bytes'] * 8 / args.ids:.2f} bits/id, {result['hashes']} hashes), "
+          f"filled in {result['fill_seconds']:.1f}s")
+    print(f"false positives: {result['false_positive_rate']:.5f} "
+          f"over {args.probes:,} unseen ids")
+    print(f"recent window: {args.recent:,} exact ids in "
+          f"{result['recent_bytes'] / 2 ** 20:,.1f} MiB")
+    print(f"lookup of a new id: {result['probe_us']:.2f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Balance History
+===============
+Point-in-time queries over an account's transactions.
+
+BankAccount(..., history=True) keeps a BalanceHistory: every accepted
+deposit, withdrawal or transfer appends (timestamp, money in, money out)
+to running totals stored in flat arrays. Totals are whole centavos in
+integer arrays, so answers stay exact however much money has moved
+through the account. Because changes are recorded in
+commit order with non-decreasing timestamps, the running totals are
+already prefix sums, so
+
+    balance_at(t)        one binary search over the timestamps
+    net_flow(t1, t2)     two binary searches
+    flows(t1, t2)        (money in, money out) between t1 and t2
+
+all run in O(log n), and keeping the index up to date costs O(1) per
+transaction - no replay of the history is ever needed.
+"""
+
+import time
+from array import array
+from bisect import bisect_right
+
+
+class BalanceHistory:
+    """
+    Append-only running totals of one account's money in and money out.
+
+    Timestamps are seconds (time.time() unless another clock is given);
+    one that goes backwards, e.g. after a clock adjustment, is recorded
+    as the previous timestamp so the arrays stay sorted. Amounts go in
+    and come out in pesos but are kept as centavos; totals that outgrow
+    64 bits move to lists of Python ints.
+    """
+
+    def __init__(self, opening_balance=0, clock=time.time):
+        self.opening_balance = opening_balance
+        self.clock = clock
+        self._opening = round(opening_balance * 100)
+        self._times = array("d")
+        self._money_in = array("q")   # Centavos deposited up to and including each entry
+        self._money_out = array("q")  # Centavos withdrawn up to and including each entry
+
+    def __len__(self):
+        return len(self._times)
+
+    def record(self, change, when=None):
+        """
+        Add one balance change (positive = money in, negative = money out).
+
+        The caller must record changes in the order they were applied -
+        BankAccount does it while holding the account lock.
+        """
+        when = self.clock() if when is None else when
+        if self._times and when < self._times[-1]:
+            when = self._times[-1]
+        change = round(change * 100)
+        money_in = self._money_in[-1] if self._money_in else 0
+        money_out = self._money_out[-1] if self._money_out else 0
+        if change >= 0:
+            money_in += change
+        else:
+            money_out -= change
+        if max(money_in, money_out) >= 1 << 63 and isinstance(self._money_in, array):
+            self._money_in = list(self._money_in)
+            self._money_out = list(self._money_out)
+        self._times.append(when)
+        self._money_in.append(money_in)
+        self._money_out.append(money_out)
+
+    def _totals_at(self, when):
+        """(money in, money out) in centavos over every change made at or before when."""
+        i = bisect_right(self._times, when)
+        if i == 0:
+            return 0, 0
+        return self._money_in[i - 1], self._money_out[i - 1]
+
+    def balance_at(self, when):
+        """Balance right after every change made at or before when."""
+        money_in, money_out = self._totals_at(when)
+        return (self._opening + money_in - money_out) / 100
+
+    def flows(self, start, end):
+        """
+        Money that moved in each direction after start, up to and including end.
+
+        Returns:
+            tuple: (money in, money out)
+        """
+        in_end, out_end = self._totals_at(end)
+        in_start, out_start = self._totals_at(start)
+        return (in_end - in_start) / 100, (out_end - out_start) / 100
+
+    def net_flow(self, start, end):
+        """Change in balance between start and end (money in minus money out)."""
+        in_end, out_end = self._totals_at(end)
+        in_start, out_start = self._totals_at(start)
+        return ((in_end - in_start) - (out_end - out_start)) / 100
@@ -0,0 +1,230 @@
+"""
+Bank Settlement Ingest
+======================
+Command-line tool that loads a settlement file of deposits and
+withdrawals into an AccountStore in batches.
+
+Input is CSV with one transaction per line:
+
+    account_id,type,amount        (optional header line)
+    17,deposit,2500.00
+    42,withdraw,120.50
+
+The file is read in fixed-size chunks (whole lines only), each chunk is
+parsed into arrays and applied with one AccountStore.apply_many() call,
+so memory use depends on the chunk size, not the file size. Rows are
+applied in file order and follow BankAccount's rules; rows that fail go
+to a rejects file as "line,reason,original row".
+
+Usage: python bank_ingest.py settlement.csv --accounts 1000000 --opening 500
+"""
+
+import argparse
+import time
+
+from account_store import AccountStore, np
+
+DEFAULT_CHUNK_BYTES = 16 << 20
+
+# Largest amount a row may carry, in pesos; anything bigger (or inf/nan)
+# is malformed, so amounts in centavos always fit the store's int64 column
+MAX_AMOUNT = 10 ** 12
+
+UNKNOWN_ACCOUNT = "Unknown account"
+MALFORMED = "Malformed row"
+INVALID_DEPOSIT = "Invalid deposit amount"
+INVALID_WITHDRAWAL = "Invalid withdrawal amount"
+INSUFFICIENT = "Insufficient balance"
+
+
+def read_chunks(f, chunk_bytes=DEFAULT_CHUNK_BYTES):
+    """
+    Yield the file as byte chunks that end on a line break.
+
+    The partial line at the end of each read is carried into the next
+    chunk; a file without a final newline still yields its last line.
+    """
+    carry = b""
+    while True:
+        data = f.read(chunk_bytes)
+        if not data:
+            if carry:
+                yield carry + b"\n"
+            return
+        data = carry + data
+        cut = data.rfind(b"\n") + 1
+        carry = data[cut:]
+        if cut:
+            yield data[:cut]
+
+
+def parse_chunk(chunk):
+    """
+    Split a chunk of complete lines into columns.
+
+    A line is malformed unless it has exactly three fields, an account id
+    that fits in 64 bits, a type of "deposit" or "withdraw" and a finite
+    amount of at most MAX_AMOUNT either way.
+
+    Returns:
+        tuple: (account ids, amounts, deposit flags, malformed) where the
+        first three hold one entry per line (0 / False for malformed
+        lines) and malformed lists the indexes of lines that could not be
+        parsed
+    """
+    if np is not None:
+        data = chunk.replace(b"\r", b"")
+        # Every line must be "field,field,field\n": the commas and line
+        # breaks, in order, have to repeat exactly that pattern
+        raw = np.frombuffer(data, dtype=np.uint8)
+        separators = raw[(raw == ord(",")) | (raw == ord("\n"))]
+        lines = chunk.count(b"\n")
+        if len(separators) == 3 * lines and \
+                (separators.reshape(-1, 3) == np.frombuffer(b",,\n", dtype=np.uint8)).all():
+            fields = data.replace(b"\n", b",").split(b",")
+            fields.pop()  # Empty string after the final line break
+            try:
+                ids = np.array(fields[0::3]).astype(np.int64)
+                amounts = np.array(fields[2::3]).astype(np.float64)
+            except (ValueError, OverflowError):
+                pass  # Some line is off; parse this chunk line by line
+            else:
+                kinds = np.array(fields[1::3])
+                deposits = kinds == b"deposit"
+                # NaN fails the comparison too
+                if (deposits | (kinds == b"withdraw")).all() and \
+                        (np.abs(amounts) <= MAX_AMOUNT).all():
+                    return ids, amounts, deposits, []
+
+    ids, amounts, deposits, malformed = [], [], [], []
+    for index, line in enumerate(chunk.split(b"\n")[:-1]):
+        try:
+            account_id, kind, amount = line.strip().split(b",")
+            account_id, amount = int(account_id), float(amount)
+            if kind not in (b"deposit", b"withdraw") or account_id.bit_length() > 63 \
+                    or not abs(amount) <= MAX_AMOUNT:
+                raise ValueError
+        except ValueError:
+            malformed.append(index)
+            account_id, kind, amount = 0, b"", 0.0
+        ids.append(account_id)
+        amounts.append(amount)
+        deposits.append(kind == b"deposit")
+    if np is not None:
+        return (np.array(ids, dtype=np.int64), np.array(amounts, dtype=np.float64),
+                np.array(deposits, dtype=bool), malformed)
+    return ids, amounts, deposits, malformed
+
+
+def _reject_reasons(ids, amounts, deposits, ok, malformed, accounts):
+    """{line index in chunk: reason} for every row that did not go through."""
+    reasons = {index: MALFORMED for index in malformed}
+    if np is not None:
+        failed = np.flatnonzero(~ok).tolist()
+    else:
+        failed = [index for index, good in enumerate(ok) if not good]
+    for index in failed:
+        if index in reasons:
+            continue
+        if not 1 <= ids[index] <= accounts:
+            reasons[index] = UNKNOWN_ACCOUNT
+        elif round(amounts[index] * 100) <= 0:
+            reasons[index] = INVALID_DEPOSIT if deposits[index] else INVALID_WITHDRAWAL
+        else:
+            reasons[index] = INSUFFICIENT
+    return reasons
+
+
+def ingest(f, store, rejects=None, chunk_bytes=DEFAULT_CHUNK_BYTES):
+    """
+    Apply every transaction in a binary file object to store.
+
+    Account ids in the file are 1-based: id k is row k - 1 of the store,
+    the same numbering BankAccount and the ledger use.
+
+    Args:
+        f: File opened in binary mode
+        store: AccountStore to change
+        rejects: Optional text file for "line,reason,original row" lines
+        chunk_bytes: Bytes read and applied per batch
+
+    Returns:
+        tuple: (rows applied, rows rejected)
+    """
+    accounts = len(store)
+    applied = rejected = 0
+    line = 1
+    first = True
+    for chunk in read_chunks(f, chunk_bytes):
+        if first:
+            first = False
+            head = chunk.lstrip()[:1]
+            if head and not (head.isdigit() or head == b"-"):
+                chunk = chunk[chunk.find(b"\n") + 1:]  # Skip the header line
+                line += 1
+                if not chunk:
+                    continue
+        ids, amounts, deposits, malformed = parse_chunk(chunk)
+        count = len(ids)
+
+        # Unknown ids (and malformed lines) are sent through as zero-amount
+        # rows on account 0, which the store always rejects
+        if np is not None:
+            known = (ids >= 1) & (ids <= accounts)
+            if malformed:
+                known[malformed] = False
+            rows = np.where(known, ids - 1, 0)
+            ok = store.apply_many(rows, np.where(known, amounts, 0.0), deposits) \
+                if accounts else np.zeros(count, dtype=bool)
+            good = int(ok.sum())
+        else:
+            bad = set(malformed)
+            known = [1 <= account_id <= accounts and index not in bad
+                     for index, account_id in enumerate(ids)]
+            rows = [account_id - 1 if fine else 0 for account_id, fine in zip(ids, known)]
+            ok = store.apply_many(rows, [amount if fine else 0.0
+                                         for amount, fine in zip(amounts, known)], deposits) \
+                if accounts else [False] * count
+            good = sum(ok)
+
+        applied += good
+        rejected += count - good
+        if rejects is not None and good < count:
+            reasons = _reject_reasons(ids, amounts, deposits, ok, malformed, accounts)
+            lines = chunk.decode(errors="replace").split("\n")
+            rejects.write("".join(f"{line + index},{reasons[index]},{lines[index].rstrip()}\n"
+                                  for index in sorted(reasons)))
+        line += count
+    return applied, rejected
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load a settlement CSV into the bank.")
+    parser.add_argument("path", help="CSV file of account_id,type,amount rows")
+    parser.add_argument("--accounts", type=int, required=True,
+                        help="number of accounts; valid ids are 1..accounts")
+    parser.add_argument("--opening", type=float, default=0,
+                        help="opening balance of every account")
+    parser.add_argument("--rejects", metavar="FILE",
+                        help="where to write rejected rows (default: PATH.rejects.csv)")
+    parser.add_argument("--chunk-mb", type=int, default=DEFAULT_CHUNK_BYTES >> 20,
+                        help="megabytes read per batch (default: 16)")
+    args = parser.parse_args()
+
+    store = AccountStore()
+    store.open_accounts([""] * args.accounts, [args.opening] * args.accounts)
+    rejects_path = args.rejects or f"{args.path}.rejects.csv"
+
+    start = time.perf_counter()
+    with open(args.path, "rb") as f, open(rejects_path, "w") as rejects:
+        applied, rejected = ingest(f, store, rejects, args.chunk_mb << 20)
+    seconds = time.perf_counter() - start
+
+    rows = applied + rejected
+    print(f"{rows:,} rows in {seconds:.1f}s ({rows / max(seconds, 1e-9):,.0f} rows/s): "
+          f"{applied:,} applied, {rejected:,} rejected -> {rejects_path}")
+    print(f"Total balance: ₱{sum(store.balances()):,.2f}")
+
+
+if __name__ == "__main__":
+    main()
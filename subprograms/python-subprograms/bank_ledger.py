@@ -0,0 +1,383 @@
+"""
+Bank Transaction Ledger
+=======================
+Append-only write-ahead log for BankAccount, so balances survive a crash.
+
+Every accepted deposit, withdrawal and transfer is written as one
+fixed-size binary record before the call returns. Writers do not fsync on
+their own: a background thread flushes whatever has piled up every
+flush_interval seconds (or as soon as batch_size records are waiting) with
+a single fsync, and every writer in that batch is released together
+(group commit).
+
+Snapshots keep restarts fast: checkpoint() writes every balance to a
+compact file together with the log position it reflects, and recovery
+loads the newest snapshot and replays only the records written after it.
+SnapshotWriter does this in the background every few seconds. While a
+ledger is writing, a snapshot covers only records it has already fsynced,
+so it can never point past what survives an OS crash.
+
+Usage:
+    ledger = TransactionLedger("bank.wal", snapshot_path="bank.snap")
+    snapshots = SnapshotWriter("bank.wal", "bank.snap", interval=60, ledger=ledger)
+    account = BankAccount("Mark", 1000, ledger=ledger)
+    account.deposit(500)            # returns once the record is on disk
+    ...
+    accounts = recover_accounts("bank.wal", ledger=ledger,
+                                snapshot_path="bank.snap")  # after a restart
+"""
+
+import mmap
+import os
+import struct
+import threading
+import zlib
+
+from bank_system import BankAccount, _new_account_id
+
+# Record layout: seq, op, account id, other account id (transfers only),
+# amount in centavos, then a CRC32 of everything before it so a record torn
+# by a crash is recognised during recovery
+RECORD = struct.Struct("<QBQQqI")
+OPEN, DEPOSIT, WITHDRAW, TRANSFER = range(4)
+
+# Snapshot layout: header (magic, seq of the last record included, log
+# offset just past it, number of accounts, CRC32 of the entries), then one
+# (account id, centavos) entry per account sorted by id
+SNAPSHOT_HEADER = struct.Struct("<8sQQQI4x")
+SNAPSHOT_ENTRY = struct.Struct("<Qq")
+SNAPSHOT_MAGIC = b"BANKSNAP"
+
+
+def to_centavos(amount):
+    """Pesos (int or float) to a whole number of centavos."""
+    return round(amount * 100)
+
+
+def pack_record(seq, op, account_id, amount, other_id=0):
+    """Encode one ledger record; amount is in centavos."""
+    body = RECORD.pack(seq, op, account_id, other_id, amount, 0)[:-4]
+    return body + struct.pack("<I", zlib.crc32(body))
+
+
+def read_records(path, offset=0, end=None):
+    """
+    Yield (seq, op, account_id, other_id, centavos, end_offset) per record.
+
+    Reading stops at the first short or corrupted record, which is where
+    a crash interrupted the last write, or at byte offset end if given.
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, "rb") as f:
+        f.seek(offset)
+        while end is None or offset + RECORD.size <= end:
+            data = f.read(RECORD.size)
+            if len(data) < RECORD.size:
+                return
+            seq, op, account_id, other_id, amount, crc = RECORD.unpack(data)
+            if zlib.crc32(data[:-4]) != crc:
+                return
+            offset += RECORD.size
+            yield seq, op, account_id, other_id, amount, offset
+
+
+def apply_record(balances, op, account_id, other_id, amount):
+    """Apply one decoded record to a {account_id: centavos} dict."""
+    if op == OPEN:
+        balances[account_id] = amount
+    elif op == DEPOSIT:
+        balances[account_id] = balances.get(account_id, 0) + amount
+    elif op == WITHDRAW:
+        balances[account_id] = balances.get(account_id, 0) - amount
+    elif op == TRANSFER:
+        balances[account_id] = balances.get(account_id, 0) - amount
+        balances[other_id] = balances.get(other_id, 0) + amount
+
+
+def replay(path, snapshot_path=None, end=None):
+    """
+    Rebuild every balance from the newest snapshot plus the log after it.
+
+    Without a snapshot (or if the file does not exist yet) the whole log
+    is replayed; with end, records past that byte offset are ignored.
+
+    Returns:
+        tuple: ({account_id: balance in centavos}, last sequence number,
+        byte offset just past the last good record)
+    """
+    if snapshot_path and os.path.exists(snapshot_path):
+        balances, last_seq, start = load_snapshot(snapshot_path)
+        log_size = os.path.getsize(path) if os.path.exists(path) else 0
+        if start > log_size:
+            raise ValueError(f"{path} is shorter than snapshot {snapshot_path} expects")
+    else:
+        balances, last_seq, start = {}, 0, 0
+    good_end = start
+    first = True
+    for seq, op, account_id, other_id, amount, good_end in read_records(path, start, end):
+        if first and seq != last_seq + 1:
+            raise ValueError(f"{path} does not continue snapshot {snapshot_path}")
+        first = False
+        apply_record(balances, op, account_id, other_id, amount)
+        last_seq = seq
+    return balances, last_seq, good_end
+
+
+def write_snapshot(snapshot_path, balances, last_seq, log_offset):
+    """
+    Atomically save balances ({account_id: centavos}) as of a log position.
+
+    The new file is written and fsynced under a temporary name and then
+    renamed over the old one, so a crash leaves either the old snapshot or
+    the new one, never a mix.
+    """
+    body = b"".join(SNAPSHOT_ENTRY.pack(account_id, centavos)
+                    for account_id, centavos in sorted(balances.items()))
+    header = SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, last_seq, log_offset,
+                                  len(balances), zlib.crc32(body))
+    tmp_path = f"{snapshot_path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        f.write(body)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, snapshot_path)
+    # Make the rename itself durable
+    directory = os.open(os.path.dirname(os.path.abspath(snapshot_path)), os.O_RDONLY)
+    try:
+        os.fsync(directory)
+    finally:
+        os.close(directory)
+
+
+def load_snapshot(snapshot_path):
+    """
+    Read a snapshot file through mmap.
+
+    Returns:
+        tuple: ({account_id: centavos}, last sequence number, log offset)
+    """
+    with open(snapshot_path, "rb") as f, \
+            mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        magic, last_seq, log_offset, count, crc = SNAPSHOT_HEADER.unpack_from(data)
+        body = memoryview(data)[SNAPSHOT_HEADER.size:]
+        try:
+            if magic != SNAPSHOT_MAGIC or len(body) != count * SNAPSHOT_ENTRY.size \
+                    or zlib.crc32(body) != crc:
+                raise ValueError(f"{snapshot_path} is not a valid bank snapshot")
+            balances = dict(SNAPSHOT_ENTRY.iter_unpack(body))
+        finally:
+            body.release()
+    return balances, last_seq, log_offset
+
+
+def checkpoint(path, snapshot_path, ledger=None):
+    """
+    Fold the log written since the last snapshot into a new snapshot.
+
+    Each checkpoint replays just the records added since the previous
+    one. Pass the TransactionLedger that is writing path to checkpoint
+    while accounts keep logging: only records it has fsynced are read.
+    Without a ledger the whole file is read, so nothing may be writing it.
+
+    Returns:
+        int: Sequence number of the last record the new snapshot includes
+    """
+    durable_end = ledger.durable_position()[1] if ledger is not None else None
+    balances, last_seq, end = replay(path, snapshot_path, durable_end)
+    write_snapshot(snapshot_path, balances, last_seq, end)
+    return last_seq
+
+
+def recover_accounts(path, owners=None, ledger=None, snapshot_path=None):
+    """
+    Recreate BankAccount objects from the snapshot and log after a restart.
+
+    The log stores ids and amounts only, so owner names come from the
+    owners dict ({account_id: name}) when given.
+
+    Returns:
+        dict: {account_id: BankAccount} with the recovered balances
+    """
+    balances, _, _ = replay(path, snapshot_path)
+    owners = owners or {}
+    accounts = {}
+    for account_id, centavos in balances.items():
+        account = BankAccount(owners.get(account_id, f"Account {account_id}"),
+                              centavos / 100, verbose=False, account_id=account_id)
+        account.ledger = ledger  # Attach afterwards so nothing is re-logged
+        accounts[account_id] = account
+    return accounts
+
+
+class SnapshotWriter:
+    """
+    Background thread that calls checkpoint() every interval seconds.
+
+    Restart time then depends on the number of accounts plus at most one
+    interval's worth of log, not on the length of the whole history. Pass
+    the ledger writing path so each snapshot stops at its durable records.
+    """
+
+    def __init__(self, path, snapshot_path, interval=60.0, ledger=None):
+        self.path = path
+        self.snapshot_path = snapshot_path
+        self.interval = interval
+        self.ledger = ledger
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            checkpoint(self.path, self.snapshot_path, self.ledger)
+
+    def close(self):
+        """Stop the thread and take one last snapshot."""
+        self._stop.set()
+        self._thread.join()
+        checkpoint(self.path, self.snapshot_path, self.ledger)
+
+
+class TransactionLedger:
+    """
+    Write-ahead log file with group commit.
+
+    log_*() methods append a record to an in-memory batch and return its
+    sequence number; wait_durable(seq) blocks until that record has been
+    fsynced. BankAccount calls the first while holding the account lock
+    (so records of one account are in balance order) and the second after
+    releasing it (so many writers share one fsync).
+
+    If a write or fsync fails, the ledger stops: the error is raised from
+    every wait_durable() still waiting, from flush() and from any later
+    log_*() call.
+    """
+
+    def __init__(self, path, flush_interval=0.005, batch_size=1024, snapshot_path=None):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.fsyncs = 0  # Number of group commits so far
+
+        # Drop a torn record left at the end by a crash, then continue the
+        # sequence where the good part of the log stopped
+        balances, self._last_seq, good_end = replay(path, snapshot_path)
+        self._file = open(path, "ab")
+        self._file.truncate(good_end)
+        self._durable_seq = self._last_seq
+        self._durable_offset = good_end
+        self._error = None
+
+        # New accounts must not reuse an id that is already in the log
+        self._account_ids = set(balances)
+        if balances:
+            _new_account_id(max(balances))
+
+        self._batch = []
+        self._flush_now = False
+        self._closed = False
+        self._cond = threading.Condition()
+        self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+        self._flusher.start()
+
+    def log_open(self, account_id, balance):
+        with self._cond:
+            if account_id in self._account_ids:
+                raise ValueError(f"account {account_id} is already in the ledger")
+            seq = self._append(OPEN, account_id, to_centavos(balance))
+            self._account_ids.add(account_id)
+            return seq
+
+    def log_deposit(self, account_id, amount):
+        return self._append(DEPOSIT, account_id, to_centavos(amount))
+
+    def log_withdraw(self, account_id, amount):
+        return self._append(WITHDRAW, account_id, to_centavos(amount))
+
+    def log_transfer(self, src_id, dst_id, amount):
+        return self._append(TRANSFER, src_id, to_centavos(amount), dst_id)
+
+    def _append(self, op, account_id, amount, other_id=0):
+        with self._cond:
+            if self._error is not None:
+                raise self._error
+            if self._closed:
+                raise ValueError("ledger is closed")
+            self._last_seq += 1
+            self._batch.append(pack_record(self._last_seq, op, account_id, amount, other_id))
+            if len(self._batch) == 1 or len(self._batch) >= self.batch_size:
+                self._cond.notify_all()  # Wake the flusher: batch started or full
+            return self._last_seq
+
+    def wait_durable(self, seq):
+        """Block until the record with this sequence number is on disk."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._durable_seq >= seq or self._error is not None)
+            if self._durable_seq < seq:
+                raise self._error
+
+    def durable_position(self):
+        """(sequence number, log offset just past it) of the last fsynced record."""
+        with self._cond:
+            return self._durable_seq, self._durable_offset
+
+    def flush(self):
+        """Write and fsync everything logged so far."""
+        with self._cond:
+            if self._error is not None:
+                raise self._error
+            seq = self._last_seq
+            self._flush_now = True
+            self._cond.notify_all()
+        self.wait_durable(seq)
+
+    def _flush_loop(self):
+        def batch_full():
+            return len(self._batch) >= self.batch_size or self._flush_now or self._closed
+
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._batch or self._closed)
+                # Give more writers flush_interval to join this commit
+                self._cond.wait_for(batch_full, self.flush_interval)
+                batch, self._batch = self._batch, []
+                seq = self._last_seq
+                self._flush_now = False
+                closing = self._closed
+            if batch:
+                data = b"".join(batch)
+                try:
+                    self._file.write(data)
+                    self._file.flush()
+                    os.fsync(self._file.fileno())
+                except Exception as error:
+                    with self._cond:
+                        self._error = error
+                        self._closed = True
+                        self._cond.notify_all()  # Fail the waiters instead of hanging them
+                    return
+                with self._cond:
+                    self.fsyncs += 1
+                    self._durable_seq = seq
+                    self._durable_offset += len(data)
+                    self._cond.notify_all()
+            if closing:
+                return
+
+    def close(self):
+        """Flush what is left and close the file."""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        self._flusher.join()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,92 @@
+"""
+Bank Server Load Generator
+==========================
+Opens many connections to bank_server.py, keeps a window of pipelined
+commands in flight on each, and reports throughput and tail latency.
+
+The command mix is mostly balance checks with some deposits, withdrawals
+and transfers across the accounts the server opened at startup.
+
+Usage: python bank_loadgen.py --port 9000 --connections 1000 --requests 200000
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+
+def random_command(rng, accounts):
+    kind = rng.random()
+    account = rng.randint(1, accounts)
+    if kind < 0.5:
+        return f"B {account}"
+    if kind < 0.7:
+        return f"D {account} {rng.randint(1, 500)}"
+    if kind < 0.9:
+        return f"W {account} {rng.randint(1, 500)}"
+    return f"T {account} {rng.randint(1, accounts)} {rng.randint(1, 500)}"
+
+
+async def run_connection(host, port, requests, pipeline, accounts, seed, latencies):
+    """Send requests commands, keeping up to pipeline of them unanswered."""
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, port)
+    sent_at = []
+    received = 0
+    sent = 0
+    while received < requests:
+        # Top the window up, then wait for at least one reply
+        burst = []
+        while sent < requests and sent - received < pipeline:
+            burst.append(random_command(rng, accounts))
+            sent += 1
+        if burst:
+            now = time.perf_counter()
+            sent_at.extend([now] * len(burst))
+            writer.write(("\n".join(burst) + "\n").encode())
+        line = await reader.readline()
+        if not line:
+            raise ConnectionError("server closed the connection early")
+        latencies.append(time.perf_counter() - sent_at[received])
+        received += 1
+    writer.close()
+
+
+def percentile(sorted_values, fraction):
+    """Value below which the given fraction of sorted_values falls."""
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+async def run_load(args):
+    per_connection = max(1, args.requests // args.connections)
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(run_connection(args.host, args.port, per_connection, args.pipeline,
+                                          args.accounts, seed, latencies)
+                           for seed in range(args.connections)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    print(f"{len(latencies)} commands over {args.connections} connections in {elapsed:.2f}s")
+    print(f"throughput: {len(latencies) / elapsed:,.0f} commands/s")
+    print(f"latency p50: {percentile(latencies, 0.50) * 1e3:.2f} ms  "
+          f"p99: {percentile(latencies, 0.99) * 1e3:.2f} ms  "
+          f"p99.9: {percentile(latencies, 0.999) * 1e3:.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test bank_server.py.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--connections", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=200000, help="total commands")
+    parser.add_argument("--pipeline", type=int, default=16,
+                        help="commands in flight per connection")
+    parser.add_argument("--accounts", type=int, default=1000,
+                        help="number of accounts the server opened at startup")
+    asyncio.run(run_load(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+"""
+Bank Metrics
+============
+Latency histograms and counters for BankAccount operations.
+
+Pass a BankMetrics object as metrics= when creating accounts and every
+deposit, withdraw, transfer and get_balance call is timed and counted
+under its operation and outcome ("ok", "invalid_amount" or
+"insufficient_balance"). Accounts can share one BankMetrics.
+
+Latencies go into HDR-style histograms: buckets are exact for small
+values and then split every power of two into a fixed number of
+sub-buckets, so any recorded value is known to within about 3% while a
+histogram covering 1 ns to a minute stays a flat list of about a thousand
+counters. Recording is one bit_length(), a shift and an increment into
+a histogram owned by the calling thread - no lock is taken.
+
+Usage:
+    metrics = BankMetrics()
+    account = BankAccount("Mark", 1000, metrics=metrics)
+    ...
+    print(metrics.to_prometheus())          # text exposition format
+    print(json.dumps(metrics.to_json()))    # percentiles per operation
+    start_http_server(metrics, 9100)        # or let Prometheus scrape it
+"""
+
+import json
+import threading
+import weakref
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Upper bounds (seconds) of the cumulative buckets in the Prometheus export
+PROMETHEUS_BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4,
+                      1e-3, 2.5e-3, 5e-3, 1e-2, 2.5e-2, 5e-2, 0.1, 0.25, 0.5, 1.0,
+                      2.5, 5.0, 10.0)
+
+
+class LatencyHistogram:
+    """
+    Log-linear histogram of non-negative integers (nanoseconds here).
+
+    Values below 2 * 2**sub_bucket_bits get one bucket each; above that,
+    each power-of-two range is split into 2**sub_bucket_bits buckets.
+    Values above highest are counted in the last bucket (max stays exact;
+    min is read back from the buckets).
+
+    A histogram has no lock of its own: only one thread should record
+    into it. BankMetrics gives every thread its own and merges them
+    when exporting.
+    """
+
+    def __init__(self, highest=60 * 10 ** 9, sub_bucket_bits=5):
+        self._bits = sub_bucket_bits
+        self._linear = 2 << sub_bucket_bits
+        self._counts = [0] * (self._index(highest) + 1)
+        self._last = len(self._counts) - 1
+        self.count = 0
+        self.total = 0
+        self.max = 0
+
+    def _index(self, value):
+        if value < self._linear:
+            return value
+        shift = value.bit_length() - self._bits - 1
+        return (shift << self._bits) + (value >> shift)
+
+    def _highest_in(self, index):
+        """Largest value that lands in bucket index."""
+        shift = max(0, (index >> self._bits) - 1)
+        return (((index - (shift << self._bits)) + 1) << shift) - 1
+
+    def record(self, value):
+        if value >= self._linear:
+            shift = value.bit_length() - self._bits - 1
+            index = (shift << self._bits) + (value >> shift)
+            if index > self._last:
+                index = self._last
+        else:
+            index = value if value > 0 else 0
+        self._counts[index] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        """Add the recordings of another histogram with the same layout."""
+        for index, bucket in enumerate(list(other._counts)):
+            if bucket:
+                self._counts[index] += bucket
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    @property
+    def min(self):
+        """Lowest recorded value, to bucket precision (0 if empty)."""
+        for index, bucket in enumerate(self._counts):
+            if bucket:
+                return index if index < self._linear else self._highest_in(index - 1) + 1
+        return 0
+
+    def percentile(self, q):
+        """Value at or below which q percent of the recordings fall."""
+        if not self.count:
+            return 0
+        wanted = max(1, -(-self.count * q // 100))  # ceil without floats
+        seen = 0
+        for index, bucket in enumerate(self._counts):
+            seen += bucket
+            if seen >= wanted:
+                return min(self._highest_in(index), self.max)
+        return self.max
+
+    def cumulative(self, bounds):
+        """Recordings at or below each bound (same units as recorded values)."""
+        result = []
+        seen = index = 0
+        for bound in bounds:
+            while index < len(self._counts) and self._highest_in(index) <= bound:
+                seen += self._counts[index]
+                index += 1
+            result.append(seen)
+        return result
+
+
+class _ThreadToken:
+    """Placeholder kept in a thread's local storage; its finalizer marks the thread's end."""
+
+
+class BankMetrics:
+    """
+    Histograms and counters per (operation, outcome).
+
+    record() is what BankAccount calls. Each thread records into its own
+    set of histograms, so recording never waits on a lock; the export
+    methods merge them and can be called at any time from any thread.
+    When a thread ends, its histograms are folded into a shared total,
+    so threads that come and go don't pile up.
+    """
+
+    def __init__(self, highest=60 * 10 ** 9, sub_bucket_bits=5):
+        self._highest = highest
+        self._bits = sub_bucket_bits
+        self._local = threading.local()
+        self._per_thread = {}  # id -> {(operation, outcome): histogram} of a live thread
+        self._finished = {}    # Histograms of threads that have ended, merged
+        self._lock = threading.Lock()  # Taken when a thread starts or stops recording
+
+    def record(self, operation, outcome, nanoseconds):
+        try:
+            histograms = self._local.histograms
+        except AttributeError:
+            histograms = self._start_thread()
+        histogram = histograms.get((operation, outcome))
+        if histogram is None:
+            histogram = histograms[operation, outcome] = LatencyHistogram(self._highest,
+                                                                          self._bits)
+        histogram.record(nanoseconds)
+
+    def _start_thread(self):
+        """Give the calling thread its histograms, to be retired when it ends."""
+        histograms = self._local.histograms = {}
+        # The thread-local owner is released when the thread exits
+        self._local.owner = owner = _ThreadToken()
+        with self._lock:
+            self._per_thread[id(histograms)] = histograms
+        weakref.finalize(owner, self._retire, histograms)
+        return histograms
+
+    def _retire(self, histograms):
+        with self._lock:
+            del self._per_thread[id(histograms)]
+            self._add(self._finished, histograms)
+
+    def _add(self, total, histograms):
+        for key, histogram in list(histograms.items()):
+            if key not in total:
+                total[key] = LatencyHistogram(self._highest, self._bits)
+            total[key].merge(histogram)
+
+    def merged(self):
+        """
+        Every thread's histograms added together.
+
+        Returns:
+            dict: {(operation, outcome): LatencyHistogram}
+        """
+        merged = {}
+        with self._lock:
+            self._add(merged, self._finished)
+            per_thread = list(self._per_thread.values())
+        for histograms in per_thread:
+            self._add(merged, histograms)
+        return merged
+
+    def histogram(self, operation, outcome="ok"):
+        """The merged LatencyHistogram for one operation and outcome, or None."""
+        return self.merged().get((operation, outcome))
+
+    def count(self, operation, outcome=None):
+        """How many calls were recorded (for one outcome, or all of them)."""
+        return sum(histogram.count for (op, out), histogram in self.merged().items()
+                   if op == operation and outcome in (None, out))
+
+    def to_json(self):
+        """
+        Summary per operation and outcome.
+
+        Returns:
+            dict: {operation: {outcome: {"count", "sum_seconds", "min_seconds",
+            "max_seconds", "p50", "p90", "p99", "p999"}}} with latencies
+            in seconds
+        """
+        result = {}
+        for (operation, outcome), histogram in sorted(self.merged().items()):
+            result.setdefault(operation, {})[outcome] = {
+                "count": histogram.count,
+                "sum_seconds": histogram.total / 1e9,
+                "min_seconds": histogram.min / 1e9,
+                "max_seconds": histogram.max / 1e9,
+                "p50": histogram.percentile(50) / 1e9,
+                "p90": histogram.percentile(90) / 1e9,
+                "p99": histogram.percentile(99) / 1e9,
+                "p999": histogram.percentile(99.9) / 1e9,
+            }
+        return result
+
+    def to_prometheus(self):
+        """Everything in Prometheus text exposition format."""
+        lines = [
+            "# HELP bank_operations_total BankAccount calls by operation and outcome.",
+            "# TYPE bank_operations_total counter",
+        ]
+        histograms = sorted(self.merged().items())
+        for (operation, outcome), histogram in histograms:
+            lines.append(f'bank_operations_total{{op="{operation}",outcome="{outcome}"}} '
+                         f'{histogram.count}')
+        lines += [
+            "# HELP bank_operation_duration_seconds Latency of BankAccount calls.",
+            "# TYPE bank_operation_duration_seconds histogram",
+        ]
+        bounds = [round(bound * 1e9) for bound in PROMETHEUS_BUCKETS]
+        for (operation, outcome), histogram in histograms:
+            labels = f'op="{operation}",outcome="{outcome}"'
+            for bound, seen in zip(PROMETHEUS_BUCKETS, histogram.cumulative(bounds)):
+                lines.append(f'bank_operation_duration_seconds_bucket{{{labels},le="{bound:g}"}} '
+                             f'{seen}')
+            lines.append(f'bank_operation_duration_seconds_bucket{{{labels},le="+Inf"}} '
+                         f'{histogram.count}')
+            lines.append(f"bank_operation_duration_seconds_sum{{{labels}}} "
+                         f"{histogram.total / 1e9}")
+            lines.append(f"bank_operation_duration_seconds_count{{{labels}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+def start_http_server(metrics, port, host="127.0.0.1"):
+    """
+    Serve metrics in a background thread.
+
+    GET /metrics returns Prometheus text and GET /metrics.json the JSON
+    summary. Returns the server; call shutdown() on it to stop.
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/metrics":
+                body, kind = metrics.to_prometheus().encode(), "text/plain; version=0.0.4"
+            elif self.path == "/metrics.json":
+                body, kind = json.dumps(metrics.to_json()).encode(), "application/json"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", kind)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass  # Scrapes every few seconds would flood stderr
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
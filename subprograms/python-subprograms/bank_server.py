@@ -0,0 +1,168 @@
+"""
+Bank Network Server
+===================
+Asyncio TCP front-end for BankAccount, replacing the one-teller input()
+menu with a line protocol many clients can use at once.
+
+Protocol: one command per line, one reply per line, in order. Clients may
+pipeline as many commands as they like without waiting for replies.
+
+    O <owner> <balance>        open an account      -> OK <account id>
+    D <id> <amount>            deposit              -> OK <new balance>
+    W <id> <amount>            withdraw             -> OK <new balance>
+    B <id>                     balance              -> OK <balance>
+    T <src id> <dst id> <amt>  transfer             -> OK <new src balance>
+
+Failures reply "ERR <reason>", using BankAccount's own messages (e.g.
+"ERR Insufficient balance or invalid amount"). A line longer than
+MAX_LINE bytes is skipped with "ERR line too long".
+
+Everything runs on one event loop thread: each read takes every command
+that has arrived on the connection, answers them all, and sends the
+replies back with a single write.
+
+Usage: python bank_server.py --port 9000 --accounts 10000
+"""
+
+import argparse
+import asyncio
+import math
+
+from bank_system import BankAccount, transfer
+
+# Longest command line accepted, in bytes; real commands are far shorter
+MAX_LINE = 4096
+
+
+def _amount(text):
+    """float(text), refusing inf and nan."""
+    amount = float(text)
+    if not math.isfinite(amount):
+        raise ValueError(f"not a finite number: {text}")
+    return amount
+
+
+class BankService:
+    """The accounts served by one server, keyed by account id."""
+
+    def __init__(self):
+        self.accounts = {}
+
+    def open(self, owner, balance):
+        account = BankAccount(owner, balance, verbose=False)
+        self.accounts[account.account_id] = account
+        return account.account_id
+
+    def handle(self, line):
+        """Run one protocol command and return the reply line (without newline)."""
+        parts = line.split()
+        if not parts:
+            return "ERR empty command"
+        command, args = parts[0].upper(), parts[1:]
+        try:
+            if command == "O" and len(args) == 2:
+                balance = _amount(args[1])
+                if balance < 0:
+                    return "ERR Invalid opening balance"
+                return f"OK {self.open(args[0], balance)}"
+            if command == "B" and len(args) == 1:
+                return f"OK {self._account(args[0]).get_balance()}"
+            if command == "D" and len(args) == 2:
+                account = self._account(args[0])
+                if account.deposit(_amount(args[1])):
+                    return f"OK {account.get_balance()}"
+                return "ERR Invalid deposit amount"
+            if command == "W" and len(args) == 2:
+                account = self._account(args[0])
+                if account.withdraw(_amount(args[1])):
+                    return f"OK {account.get_balance()}"
+                return "ERR Insufficient balance or invalid amount"
+            if command == "T" and len(args) == 3:
+                src, dst = self._account(args[0]), self._account(args[1])
+                if transfer(src, dst, _amount(args[2])):
+                    return f"OK {src.get_balance()}"
+                return "ERR Insufficient balance or invalid amount"
+        except KeyError as error:
+            return f"ERR {error.args[0]}"
+        except ValueError:
+            return "ERR malformed number"
+        return "ERR unknown command"
+
+    def _account(self, text):
+        account = self.accounts.get(int(text))
+        if account is None:
+            raise KeyError(f"no account {text}")
+        return account
+
+
+def _reply(bank, line):
+    if len(line) > MAX_LINE:
+        return "ERR line too long"
+    # Undecodable bytes become U+FFFD, so a bad line gets its own ERR reply
+    return bank.handle(line.decode(errors="replace"))
+
+
+async def handle_client(reader, writer, bank):
+    """Answer every pipelined command on one connection until it closes."""
+    leftover = b""    # Incomplete last line, never more than MAX_LINE bytes
+    skipping = False  # Dropping the rest of a line that was too long
+    try:
+        while True:
+            data = await reader.read(65536)
+            if not data:
+                # A last command without a newline still gets its answer
+                if leftover.strip() and not skipping:
+                    writer.write((_reply(bank, leftover) + "\n").encode())
+                    await writer.drain()
+                break
+            lines = (leftover + data).split(b"\n")
+            leftover = lines.pop()
+            if skipping and lines:
+                lines.pop(0)  # End of the long line, already answered
+                skipping = False
+            replies = [_reply(bank, line) for line in lines if line.strip()]
+            if len(leftover) > MAX_LINE:
+                if not skipping:
+                    replies.append("ERR line too long")
+                    skipping = True
+                leftover = b""
+            if replies:
+                writer.write(("\n".join(replies) + "\n").encode())
+                await writer.drain()
+    except ConnectionError:
+        pass  # Client went away
+    finally:
+        writer.close()
+
+
+async def serve(host, port, bank):
+    async def on_connect(reader, writer):
+        await handle_client(reader, writer, bank)
+
+    server = await asyncio.start_server(on_connect, host, port, backlog=4096)
+    print(f"Bank server listening on {host}:{port} with {len(bank.accounts)} accounts")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the bank over TCP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--accounts", type=int, default=1000,
+                        help="accounts opened at startup (ids 1..N)")
+    parser.add_argument("--balance", type=float, default=1000,
+                        help="opening balance of those accounts")
+    args = parser.parse_args()
+
+    bank = BankService()
+    for i in range(args.accounts):
+        bank.open(f"Customer{i + 1}", args.balance)
+    try:
+        asyncio.run(serve(args.host, args.port, bank))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+"""
+Sharded Bank
+============
+Spreads accounts over several worker processes so bank operations can use
+more than one core (one Python process only ever runs one thread at a
+time because of the GIL).
+
+Each account id is hashed to one of N shards. A shard is a process that
+owns the balances of its accounts outright - no locks, no sharing - and
+applies the operations it is sent, in order, in batches over a pipe.
+
+ShardedBank.execute() takes a list of operations, sends every shard its
+part of the list in one message, lets the shards work in parallel and
+puts the answers back in order. A transfer between accounts on two
+different shards uses two-phase commit:
+
+    1. prepare  - the source shard checks the balance and holds the money
+                  back; the destination shard checks the account exists
+    2. commit   - if both said yes, the held money is dropped at the source
+                  and credited at the destination; otherwise both abort
+                  and the source gets its money back
+
+so the money ends up on exactly one side. Phase 2 goes out at the start
+of the next round, and an operation later in the list that touches
+either account waits for it, so the results are always those of running
+the list in order.
+
+Usage:
+    with ShardedBank(shards=4) as bank:
+        a = bank.open_account("Mark", 1000)
+        b = bank.open_account("Ana", 0)
+        bank.execute([("transfer", a, b, 250), ("balance", a), ("balance", b)])
+        # -> [True, 750.0, 250.0]
+"""
+
+import multiprocessing
+import threading
+
+# Messages understood by a shard: (op, account id, centavos, extra) where
+# extra is the other account for TRANSFER and the transaction id for the
+# two-phase-commit steps
+OPEN, DEPOSIT, WITHDRAW, BALANCE, TRANSFER, PREPARE_DEBIT, PREPARE_CREDIT, COMMIT, ABORT = range(9)
+
+_OPS = {"deposit": DEPOSIT, "withdraw": WITHDRAW}
+
+
+def shard_of(account_id, shards):
+    """Which shard owns an account (multiplicative hash, so runs of ids spread out)."""
+    return ((account_id * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF) % shards
+
+
+def _shard_worker(conn):
+    """Main loop of one shard process: apply each batch and send back the results."""
+    balances = {}  # account id -> centavos
+    held = {}      # transaction id -> (account id, centavos) debited, awaiting commit
+    credits = {}   # transaction id -> (account id, centavos) to add on commit
+    while True:
+        batch = conn.recv()
+        if batch is None:
+            break
+        results = []
+        for op, account_id, amount, extra in batch:
+            if op == BALANCE:
+                results.append(balances.get(account_id))
+            elif op == DEPOSIT:
+                ok = amount > 0 and account_id in balances
+                if ok:
+                    balances[account_id] += amount
+                results.append(ok)
+            elif op == WITHDRAW:
+                ok = 0 < amount <= balances.get(account_id, 0)
+                if ok:
+                    balances[account_id] -= amount
+                results.append(ok)
+            elif op == TRANSFER:
+                ok = (0 < amount <= balances.get(account_id, 0) and extra in balances
+                      and extra != account_id)
+                if ok:
+                    balances[account_id] -= amount
+                    balances[extra] += amount
+                results.append(ok)
+            elif op == PREPARE_DEBIT:
+                ok = 0 < amount <= balances.get(account_id, 0)
+                if ok:
+                    balances[account_id] -= amount
+                    held[extra] = (account_id, amount)
+                results.append(ok)
+            elif op == PREPARE_CREDIT:
+                ok = account_id in balances
+                if ok:
+                    credits[extra] = (account_id, amount)
+                results.append(ok)
+            elif op == COMMIT:
+                held.pop(extra, None)
+                if extra in credits:
+                    credited, amount = credits.pop(extra)
+                    balances[credited] += amount
+                results.append(True)
+            elif op == ABORT:
+                if extra in held:
+                    debited, amount = held.pop(extra)
+                    balances[debited] += amount
+                credits.pop(extra, None)
+                results.append(True)
+            elif op == OPEN:
+                balances[account_id] = amount
+                results.append(True)
+        conn.send(results)
+    conn.close()
+
+
+class ShardedBank:
+    """
+    ABSTRACTION: One bank, many processes
+    Callers see account ids and amounts in pesos; which process holds an
+    account and how a transfer between processes is committed stays
+    hidden. Like BankAccount, deposits and withdrawals answer True/False.
+    Safe to share between threads: calls take turns, one round trip to
+    the shards at a time
+    """
+
+    def __init__(self, shards=None, start_method=None):
+        shards = shards or multiprocessing.cpu_count()
+        context = multiprocessing.get_context(start_method)
+        self.shards = shards
+        self._owners = {}
+        self._next_id = 1
+        self._next_txn = 1
+        self._lock = threading.Lock()  # Held for a whole call, so replies match requests
+        self._conns = []
+        self._workers = []
+        for _ in range(shards):
+            parent, child = context.Pipe()
+            worker = context.Process(target=_shard_worker, args=(child,), daemon=True)
+            worker.start()
+            child.close()
+            self._conns.append(parent)
+            self._workers.append(worker)
+
+    def __len__(self):
+        return len(self._owners)
+
+    def owner(self, account_id):
+        return self._owners[account_id]
+
+    def open_account(self, owner, balance=0):
+        """Create one account and return its id."""
+        return self.open_accounts([(owner, balance)])[0]
+
+    def open_accounts(self, accounts):
+        """
+        Create many accounts in one round trip.
+
+        Args:
+            accounts: Iterable of (owner, opening balance) pairs
+
+        Returns:
+            list: The new account ids, in the order given
+        """
+        with self._lock:
+            batches = [[] for _ in range(self.shards)]
+            ids = []
+            for owner, balance in accounts:
+                account_id = self._next_id
+                self._next_id += 1
+                self._owners[account_id] = owner
+                batches[shard_of(account_id, self.shards)].append(
+                    (OPEN, account_id, round(balance * 100), 0))
+                ids.append(account_id)
+            self._round(batches)
+        return ids
+
+    def deposit(self, account_id, amount):
+        return self.execute([("deposit", account_id, amount)])[0]
+
+    def withdraw(self, account_id, amount):
+        return self.execute([("withdraw", account_id, amount)])[0]
+
+    def get_balance(self, account_id):
+        return self.execute([("balance", account_id)])[0]
+
+    def transfer(self, src_id, dst_id, amount):
+        return self.execute([("transfer", src_id, dst_id, amount)])[0]
+
+    def execute(self, operations):
+        """
+        Run a batch of operations across the shards.
+
+        Operations are tuples:
+            ("deposit", account_id, amount)
+            ("withdraw", account_id, amount)
+            ("balance", account_id)
+            ("transfer", src_id, dst_id, amount)
+
+        The results are those of applying the operations one after
+        another in the order given. Every shard gets its part of the batch
+        in one message and works on it in parallel with the others; a
+        transfer between shards is prepared in one round and committed at
+        the start of the next, and the batch is cut into another round
+        only where a later operation touches one of its two accounts.
+
+        Returns:
+            list: One result per operation - True/False for changes, the
+            balance in pesos (None for an unknown account) for "balance"
+        """
+        for operation in operations:
+            if operation[0] not in _OPS and operation[0] not in ("balance", "transfer"):
+                raise ValueError(f"unknown operation {operation[0]!r}")
+        with self._lock:
+            shards = self.shards
+            results = [None] * len(operations)
+            batches = [[] for _ in range(shards)]
+            where = []       # (operation index, shard, position in its batch)
+            two_phase = []   # (operation index, txn, src shard, src pos, dst shard, dst pos)
+            undecided = set()  # Accounts in a transfer of this round still to commit
+            for index, operation in enumerate(operations):
+                kind = operation[0]
+                touched = operation[1:3] if kind == "transfer" else operation[1:2]
+                if not undecided.isdisjoint(touched):
+                    # Settle the transfers first; their commits open the next round
+                    batches = self._settle(batches, where, two_phase, operations, results)
+                    where, two_phase, undecided = [], [], set()
+
+                if kind == "transfer":
+                    _, src_id, dst_id, amount = operation
+                    src, dst = shard_of(src_id, shards), shard_of(dst_id, shards)
+                    centavos = round(amount * 100)
+                    if src == dst:
+                        where.append((index, src, len(batches[src])))
+                        batches[src].append((TRANSFER, src_id, centavos, dst_id))
+                    else:
+                        txn = self._next_txn
+                        self._next_txn += 1
+                        two_phase.append((index, txn, src, len(batches[src]),
+                                          dst, len(batches[dst])))
+                        batches[src].append((PREPARE_DEBIT, src_id, centavos, txn))
+                        batches[dst].append((PREPARE_CREDIT, dst_id, centavos, txn))
+                        undecided.update(touched)
+                else:
+                    shard = shard_of(operation[1], shards)
+                    where.append((index, shard, len(batches[shard])))
+                    if kind == "balance":
+                        batches[shard].append((BALANCE, operation[1], 0, 0))
+                    else:
+                        batches[shard].append((_OPS[kind], operation[1],
+                                               round(operation[2] * 100), 0))
+
+            decisions = self._settle(batches, where, two_phase, operations, results)
+            if any(decisions):
+                self._round(decisions)
+            return results
+
+    def _settle(self, batches, where, two_phase, operations, results):
+        """
+        Run one round and fill in its results.
+
+        Returns:
+            list: Per shard, the COMMIT/ABORT messages for this round's
+            transfers between shards, to be sent first in the next round
+        """
+        replies = self._round(batches)
+        for index, shard, position in where:
+            value = replies[shard][position]
+            if operations[index][0] == "balance":
+                value = None if value is None else value / 100
+            results[index] = value
+        decisions = [[] for _ in range(self.shards)]
+        for index, txn, src, src_pos, dst, dst_pos in two_phase:
+            ok = replies[src][src_pos] and replies[dst][dst_pos]
+            step = COMMIT if ok else ABORT
+            decisions[src].append((step, 0, 0, txn))
+            decisions[dst].append((step, 0, 0, txn))
+            results[index] = ok
+        return decisions
+
+    def _round(self, batches):
+        """Send every non-empty batch, then collect the replies (shards run in parallel)."""
+        busy = [shard for shard, batch in enumerate(batches) if batch]
+        for shard in busy:
+            self._conns[shard].send(batches[shard])
+        replies = [None] * self.shards
+        for shard in busy:
+            replies[shard] = self._conns[shard].recv()
+        return replies
+
+    def close(self):
+        """Stop the shard processes."""
+        with self._lock:
+            for conn in self._conns:
+                try:
+                    conn.send(None)
+                except (BrokenPipeError, OSError):
+                    pass
+            for worker in self._workers:
+                worker.join()
+            for conn in self._conns:
+                conn.close()
+            self._conns = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -6,51 +6,492 @@ ABSTRACTION DEMONSTRATION:
 - Complex balance management is simplified into deposit(), withdraw(), get_balance()
 """
 
+import threading
+from array import array
+from bisect import bisect_left, insort
+from heapq import merge
+from time import perf_counter_ns
+
+from bank_history import BalanceHistory
+
+# Every account gets a unique, increasing id; transfers lock accounts in id
+# order so two opposite transfers can never wait on each other (deadlock).
+# An id claimed explicitly (account_id=...) may clash with a live account,
+# so the lock order breaks ties by object identity
+_id_lock = threading.Lock()
+_last_account_id = 0
+
+
+def _new_account_id(requested=None):
+    """Hand out the next account id, or claim a specific one (e.g. on recovery)."""
+    global _last_account_id
+    with _id_lock:
+        if requested is None:
+            _last_account_id += 1
+            return _last_account_id
+        _last_account_id = max(_last_account_id, requested)
+        return requested
+
+
+class _CommitClock:
+    """
+    Hands out increasing commit timestamps and tracks which are unfinished.
+
+    Writers call begin() before changing balances and end() afterwards;
+    stable() is the newest timestamp at or below which every commit has
+    finished, so a reader that looks only at versions up to it sees a
+    consistent bank without taking any account lock.
+
+    Readers that scan many accounts register their timestamp with
+    start_read() / end_read(); begin() tells each writer the oldest
+    timestamp anyone may still read at, and writers keep every version
+    needed for it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()  # Held only to bump the counters
+        self._last = 0
+        self._active = set()
+        self._readers = {}  # ts -> number of readers at it
+
+    def begin(self):
+        """Start a commit; returns (its timestamp, oldest timestamp still readable)."""
+        with self._lock:
+            floor = min(self._readers, default=self._stable())
+            self._last += 1
+            self._active.add(self._last)
+            return self._last, floor
+
+    def end(self, ts):
+        with self._lock:
+            self._active.discard(ts)
+
+    def stable(self):
+        with self._lock:
+            return self._stable()
+
+    def _stable(self):
+        return min(self._active) - 1 if self._active else self._last
+
+    def start_read(self):
+        """Register a reader at the current stable timestamp and return it."""
+        with self._lock:
+            ts = self._stable()
+            self._readers[ts] = self._readers.get(ts, 0) + 1
+            return ts
+
+    def end_read(self, ts):
+        with self._lock:
+            self._readers[ts] -= 1
+            if not self._readers[ts]:
+                del self._readers[ts]
+
+
+_clock = _CommitClock()
+
+
+def _whole_centavos(amount):
+    """Round pesos to whole centavos, the precision the ledger records."""
+    return round(amount, 2)
+
+# Versions a commit looks through for ones old enough to drop. Versions a
+# long snapshot still needs pile up behind it and are dropped in one go by
+# the first commit after the snapshot ends
+_PRUNE_DEPTH = 8
+
+
+class _Version:
+    """One committed balance of an account (newest first linked list)."""
+
+    __slots__ = ("balance", "ts", "prev")
+
+    def __init__(self, balance, ts, prev):
+        self.balance = balance
+        self.ts = ts
+        self.prev = prev
+
+
 class BankAccount:
     """
     ABSTRACTION: This class hides the complexity of balance management
     Users don't need to know HOW balance is stored or calculated
     They just use simple methods: deposit, withdraw, check balance
     """
-    
-    def __init__(self, owner, balance=0):
+
+    # MEMORY: fixed attribute slots instead of a per-object __dict__, which
+    # matters when a Bank holds millions of accounts
+    __slots__ = ("owner", "__balance", "account_id", "verbose", "__lock", "__version",
+                 "ledger", "metrics", "history", "dedup")
+
+    def __init__(self, owner, balance=0, verbose=True, account_id=None, ledger=None,
+                 metrics=None, history=False, dedup=None):
         """
         ENCAPSULATION: Constructor sets up account with hidden balance
+        Pass a TransactionLedger (bank_ledger.py) as ledger to make every
+        change durable before the method returns, a BankMetrics
+        (bank_metrics.py) as metrics to time and count every operation,
+        history=True to answer balance_at() / net_flow() queries, and a
+        Deduplicator (bank_dedup.py) as dedup to ignore retried txn_ids
+        Amounts and balances are kept to whole centavos
         """
+        balance = _whole_centavos(balance)
         self.owner = owner  # Public attribute - can be accessed directly
         self.__balance = balance  # PRIVATE attribute (double underscore) - HIDDEN from outside access
         # This demonstrates INFORMATION HIDING - core principle of abstraction
+        self.account_id = _new_account_id(account_id)  # Unique id, also the global lock order
+        self.verbose = verbose  # Set to False to silence the printed messages
+        self.__lock = threading.Lock()  # THREAD SAFETY: guards every change to __balance
+        self.__version = _Version(balance, 0, None)  # MVCC: committed balances for snapshots
+        self.ledger = ledger  # DURABILITY: optional write-ahead log
+        self.metrics = metrics  # MONITORING: optional latency histograms
+        self.history = BalanceHistory(balance) if history else None  # AUDIT: optional
+        self.dedup = dedup  # IDEMPOTENCY: optional record of applied txn_ids
+        if ledger is not None:
+            ledger.wait_durable(ledger.log_open(self.account_id, balance))
 
-    def deposit(self, amount):
+    def deposit(self, amount, txn_id=None):
         """
         ABSTRACTION: Simple interface for adding money
         User doesn't need to know internal validation logic or how balance is updated
+        Returns True if the deposit went through
+        With a dedup index, a txn_id that was already applied is ignored
+        (and reported as True, since that deposit did go through)
         """
+        start = perf_counter_ns() if self.metrics is not None else 0
+        outcome = "ok"
+        amount = _whole_centavos(amount)  # Less than half a centavo is no deposit
         if amount > 0:
-            self.__balance += amount  # Internal operation hidden from user
-            print(f"Deposited ₱{amount}")
-        else:
+            seq = None
+            with self.__lock:  # Read-modify-write happens as one step
+                if self.__is_duplicate(txn_id):
+                    outcome = "duplicate"
+                else:
+                    # Log first: if the ledger refuses, nothing has changed
+                    if self.ledger is not None:
+                        seq = self.ledger.log_deposit(self.account_id, amount)
+                    ts, floor = _clock.begin()
+                    self.__balance = _whole_centavos(self.__balance + amount)  # Internal operation hidden from user
+                    self.__publish(ts, floor)
+                    _clock.end(ts)
+                    if txn_id is not None and self.dedup is not None:
+                        self.dedup.record(txn_id)
+                    if self.history is not None:
+                        self.history.record(amount)
+            if seq is not None:
+                self.ledger.wait_durable(seq)  # Shares one fsync with other writers
+            if self.verbose:
+                print(f"Deposited ₱{amount}" if outcome == "ok" else "Duplicate transaction ignored")
+            if self.metrics is not None:
+                self.metrics.record("deposit", outcome, perf_counter_ns() - start)
+            return True
+        if self.verbose:
             print("Invalid deposit amount")  # Error handling abstracted away
+        if self.metrics is not None:
+            self.metrics.record("deposit", "invalid_amount", perf_counter_ns() - start)
+        return False
 
-    def withdraw(self, amount):
+    def withdraw(self, amount, txn_id=None):
         """
         ABSTRACTION: Safe withdrawal with hidden complexity
         User doesn't see the internal balance checking logic
+        Returns True if the withdrawal went through
+        With a dedup index, a txn_id that was already applied is ignored
+        (and reported as True); a rejected withdrawal may be retried
         """
-        if 0 < amount <= self.__balance:  # Complex validation hidden from user
-            self.__balance -= amount  # Internal balance manipulation
-            print(f"Withdrew ₱{amount}")
-        else:
-            print("Insufficient balance or invalid amount")
+        start = perf_counter_ns() if self.metrics is not None else 0
+        amount = _whole_centavos(amount)
+        seq = None
+        duplicate = False
+        with self.__lock:  # Check and update must not be split by another thread
+            if self.__is_duplicate(txn_id):
+                ok = duplicate = True
+            else:
+                ok = 0 < amount <= self.__balance  # Complex validation hidden from user
+            if ok and not duplicate:
+                if self.ledger is not None:
+                    seq = self.ledger.log_withdraw(self.account_id, amount)
+                ts, floor = _clock.begin()
+                self.__balance = _whole_centavos(self.__balance - amount)  # Internal balance manipulation
+                self.__publish(ts, floor)
+                _clock.end(ts)
+                if txn_id is not None and self.dedup is not None:
+                    self.dedup.record(txn_id)
+                if self.history is not None:
+                    self.history.record(-amount)
+        if seq is not None:
+            self.ledger.wait_durable(seq)
+        if self.verbose:
+            if duplicate:
+                print("Duplicate transaction ignored")
+            else:
+                print(f"Withdrew ₱{amount}" if ok else "Insufficient balance or invalid amount")
+        if self.metrics is not None:
+            outcome = "duplicate" if duplicate else _outcome(ok, amount)
+            self.metrics.record("withdraw", outcome, perf_counter_ns() - start)
+        return ok
 
     def get_balance(self):
         """
         ABSTRACTION: Controlled access to balance information
         User gets balance WITHOUT direct access to __balance variable
         This is a 'getter' method - common abstraction pattern
+        Takes no lock, so readers never wait for (or hold up) writers
         """
+        if self.metrics is not None:
+            start = perf_counter_ns()
+            balance = self.__balance
+            self.metrics.record("get_balance", "ok", perf_counter_ns() - start)
+            return balance
         return self.__balance
 
+    def balance_as_of(self, ts):
+        """
+        MVCC: The committed balance at commit timestamp ts
+        Returns None if that version is older than the ones still kept
+        """
+        version = self.__version
+        while version is not None and version.ts > ts:
+            version = version.prev
+        return None if version is None else version.balance
+
+    def balance_at(self, when):
+        """
+        AUDIT: Balance at a past moment (seconds since the epoch)
+        Needs the account to be created with history=True
+        """
+        return self.__history().balance_at(when)
+
+    def net_flow(self, start, end):
+        """
+        AUDIT: Money in minus money out after start, up to and including end
+        Needs the account to be created with history=True
+        """
+        return self.__history().net_flow(start, end)
+
+    def __is_duplicate(self, txn_id):
+        """IDEMPOTENCY: Was this txn_id already applied? (lock held)"""
+        return txn_id is not None and self.dedup is not None and self.dedup.seen(txn_id)
+
+    def __history(self):
+        if self.history is None:
+            raise ValueError(f"account {self.account_id} was created without history=True")
+        return self.history
+
+    def __publish(self, ts, floor):
+        """
+        Record the current balance as the version committed at ts (lock held)
+        Versions older than the newest one at or below floor can no longer
+        be read by anyone and are dropped, so history can't grow forever
+        """
+        self.__version = version = _Version(self.__balance, ts, self.__version)
+        for _ in range(_PRUNE_DEPTH):
+            if version.ts <= floor:
+                version.prev = None
+                return
+            version = version.prev
+            if version is None:
+                return
+
+    @staticmethod
+    def transfer(src, dst, amount):
+        """
+        ABSTRACTION: Move money between two accounts as one atomic step
+        Both accounts are locked (lowest account_id first, so concurrent
+        transfers can't deadlock) and nobody ever sees the money in both
+        accounts or in neither
+        Returns True if the transfer went through
+        """
+        start = perf_counter_ns() if src.metrics is not None else 0
+        amount = _whole_centavos(amount)
+        seq = None
+        if src is dst:
+            ok = False
+        else:
+            first, second = sorted((src, dst), key=_lock_order)
+            with first.__lock, second.__lock:
+                ok = 0 < amount <= src.__balance
+                if ok:
+                    if src.ledger is not None:
+                        seq = src.ledger.log_transfer(src.account_id, dst.account_id, amount)
+                    # One timestamp for both sides: snapshots see both or neither
+                    ts, floor = _clock.begin()
+                    src.__balance = _whole_centavos(src.__balance - amount)
+                    dst.__balance = _whole_centavos(dst.__balance + amount)
+                    src.__publish(ts, floor)
+                    dst.__publish(ts, floor)
+                    _clock.end(ts)
+                    if src.history is not None:
+                        src.history.record(-amount)
+                    if dst.history is not None:
+                        dst.history.record(amount)
+        if seq is not None:
+            src.ledger.wait_durable(seq)
+        if src.verbose:
+            if ok:
+                print(f"Transferred ₱{amount} from {src.owner} to {dst.owner}")
+            else:
+                print("Insufficient balance or invalid amount")
+        if src.metrics is not None:
+            src.metrics.record("transfer", _outcome(ok, amount), perf_counter_ns() - start)
+        return ok
+
+
+def _lock_order(account):
+    """Sort key for locking: account id, then object identity for equal ids."""
+    return account.account_id, id(account)
+
+
+def _outcome(ok, amount):
+    """Metrics label for how a withdrawal or transfer ended."""
+    if ok:
+        return "ok"
+    return "invalid_amount" if amount <= 0 else "insufficient_balance"
+
+
+# Module-level shortcut: transfer(src, dst, amount)
+transfer = BankAccount.transfer
+
+
+def snapshot_balances(accounts):
+    """
+    ABSTRACTION: A consistent picture of many balances at one instant
+    Reads committed versions as of the newest finished commit, without
+    locking any account, so deposits and withdrawals keep running while
+    the snapshot is taken. Money moved by a transfer shows up on both
+    sides or on neither.
+    The snapshot's timestamp is registered for the whole scan, so the
+    versions it needs are kept however busy an account is, and one pass
+    always finishes.
+    Returns {account_id: balance}
+    """
+    accounts = list(accounts)
+    ts = _clock.start_read()
+    try:
+        return {account.account_id: account.balance_as_of(ts) for account in accounts}
+    finally:
+        _clock.end_read(ts)
+
+
+class Bank:
+    """
+    ABSTRACTION: One place to find any account
+    Keeps every account by id, a hash index from owner name to account
+    ids, and a sorted list of owner names for type-ahead search - so
+    finding someone's accounts never means scanning every object
+    Owner names are matched without regard to case
+    """
+
+    # Names added since the last merge wait in a small sorted tail, so
+    # opening an account never re-sorts the big list
+    _TAIL_LIMIT = 1 << 16
+
+    def __init__(self):
+        self._accounts = {}  # account_id -> BankAccount
+        self._owners = {}    # owner key -> account id, or array('q') of ids if several
+        self._names = []     # sorted owner keys
+        self._tail = []      # sorted owner keys not merged into _names yet
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._accounts)
+
+    def __contains__(self, account_id):
+        return account_id in self._accounts
+
+    @staticmethod
+    def _key(owner):
+        return " ".join(owner.split()).casefold()
+
+    def open_account(self, owner, balance=0, **options):
+        """
+        Create a BankAccount and register it
+        options are passed on to BankAccount (verbose, ledger, metrics...)
+        """
+        options.setdefault("verbose", False)
+        return self.add(BankAccount(owner, balance, **options))
+
+    def add(self, account):
+        """Register an existing account; returns it"""
+        with self._lock:
+            if account.account_id in self._accounts:
+                raise ValueError(f"account {account.account_id} is already registered")
+            self._accounts[account.account_id] = account
+            self._index(account.account_id, self._key(account.owner))
+        return account
+
+    def _index(self, account_id, key):
+        """Add account_id under owner key (lock held)"""
+        ids = self._owners.get(key)
+        if ids is None:
+            self._owners[key] = account_id
+            insort(self._tail, key)
+            if len(self._tail) >= self._TAIL_LIMIT:
+                self._names = list(merge(self._names, self._tail))
+                self._tail = []
+        elif isinstance(ids, array):
+            ids.append(account_id)
+        else:
+            self._owners[key] = array("q", (ids, account_id))
+
+    def _unindex(self, account_id, key):
+        """Remove account_id from under owner key (lock held)"""
+        ids = self._owners[key]
+        if isinstance(ids, array) and len(ids) > 1:
+            ids.remove(account_id)
+            return
+        del self._owners[key]
+        for keys in (self._tail, self._names):
+            index = bisect_left(keys, key)
+            if index < len(keys) and keys[index] == key:
+                del keys[index]
+                return
+
+    def get(self, account_id):
+        """The account with this id (KeyError if there is none)"""
+        return self._accounts[account_id]
+
+    def find_owner(self, owner):
+        """Every account whose owner has this name, oldest first"""
+        ids = self._owners.get(self._key(owner))
+        if ids is None:
+            return []
+        if not isinstance(ids, array):
+            ids = (ids,)
+        return [self._accounts[account_id] for account_id in ids]
+
+    def search(self, prefix, limit=10):
+        """
+        Owner names starting with prefix, in alphabetical order
+        Each name appears once, however many accounts it has
+        """
+        key = self._key(prefix)
+        matches = []
+        with self._lock:
+            for keys in (self._names, self._tail):
+                start = bisect_left(keys, key)
+                for name in keys[start:start + limit]:
+                    if not name.startswith(key):
+                        break
+                    matches.append(name)
+            matches.sort()
+            owners = []
+            for name in matches[:limit]:
+                ids = self._owners[name]
+                owners.append(self._accounts[ids[0] if isinstance(ids, array) else ids].owner)
+        return owners
+
+    def rename(self, account_id, owner):
+        """
+        Change an account's owner and keep the indexes in step
+        Done under one lock hold, so get() and search() never miss the
+        account midway
+        """
+        with self._lock:
+            account = self._accounts[account_id]
+            self._unindex(account_id, self._key(account.owner))
+            account.owner = owner
+            self._index(account_id, self._key(owner))
+
 
 def main():
     """
@@ -0,0 +1,30 @@
+"""
+Prime Bitmap Builder
+====================
+Command-line tool that sieves every number up to a limit and saves the
+odd-only primality bitmap used by prime_checking.PrimeBitmap.
+
+Usage: python build_prime_bitmap.py primes.bmp --limit 4294967296
+"""
+
+import argparse
+import time
+
+from prime_checking import build_prime_bitmap
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a prime bitmap file.")
+    parser.add_argument("path", help="file to write")
+    parser.add_argument("--limit", type=int, default=2 ** 32,
+                        help="largest number covered (default: 2**32)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    build_prime_bitmap(args.path, args.limit)
+    print(f"Wrote {args.path} covering n <= {args.limit} "
+          f"in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
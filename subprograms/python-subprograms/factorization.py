@@ -0,0 +1,265 @@
+"""
+Python Integer Factorization Module
+===================================
+Splits integers into prime powers, using prime_checking.is_prime() to
+decide when a factor needs no further splitting.
+
+Small factors are removed by trial division, medium ones by Pollard-Brent
+rho, and anything rho cannot reach within its budget (e.g. both factors of
+a 40-digit semiprime) by Lenstra's elliptic-curve method.
+"""
+
+import random
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from math import gcd
+
+from prime_checking import is_prime, small_primes
+
+# Primes removed by trial division before any random splitting
+_TRIAL_PRIMES = small_primes(10000)
+
+# Pollard-Brent rho gives up after this many iterations per polynomial;
+# beyond that (factors above ~10**10) ECM is the faster tool
+_RHO_ITERATIONS = 1 << 17
+
+# (B1, curves): ECM stage-1 bound and curve count, sized for factors of
+# roughly 15, 20, 25 and 30 digits; the last row repeats with B1 doubled
+_ECM_SCHEDULE = ((2000, 25), (11000, 90), (50000, 300), (250000, 700))
+
+# Stage-2 bound is this multiple of B1; baby steps use wheel width _ECM_D
+_ECM_B2_FACTOR = 100
+_ECM_D = 2310
+
+# Every curve of a run walks the same prime lists, so sieve them once
+_primes_upto = lru_cache(maxsize=8)(small_primes)
+
+
+def factorize(n):
+    """
+    Factor a positive integer into primes.
+
+    Args:
+        n: A positive integer
+
+    Returns:
+        dict: {prime: exponent} in increasing prime order (empty for n == 1)
+    """
+    if n < 1:
+        raise ValueError("factorize() needs a positive integer")
+
+    factors = {}
+    for p in _TRIAL_PRIMES:
+        if p * p > n:
+            break
+        while n % p == 0:
+            factors[p] = factors.get(p, 0) + 1
+            n //= p
+
+    # Whatever is left has no factor below 10000; split it until every
+    # piece passes the primality check
+    pending = [n] if n > 1 else []
+    while pending:
+        m = pending.pop()
+        if is_prime(m):
+            factors[m] = factors.get(m, 0) + 1
+            continue
+        d = _split(m)
+        pending.append(d)
+        pending.append(m // d)
+
+    return dict(sorted(factors.items()))
+
+
+def factorize_many(values, workers=None):
+    """
+    Factor many integers, optionally spread across worker processes.
+
+    Args:
+        values: Iterable of positive integers
+        workers: Number of worker processes (None or 1 = this process)
+
+    Returns:
+        list: factorize(v) for each value, in the same order
+    """
+    values = list(values)
+    if workers is None or workers <= 1 or len(values) < 2:
+        return [factorize(v) for v in values]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # Hard numbers take far longer than easy ones, so hand them out in
+        # small chunks to keep every worker busy
+        chunksize = max(1, len(values) // (workers * 16))
+        return list(pool.map(factorize, values, chunksize=chunksize))
+
+
+def _split(n):
+    """Return a non-trivial factor of the composite n (no factor below 10000)."""
+    root = _perfect_power_root(n)
+    if root:
+        return root
+
+    # Seeding with n makes the factorization of a given number repeatable
+    rng = random.Random(n)
+    for _ in range(3):
+        d = _pollard_brent(n, rng.randrange(1, n), rng.randrange(1, n))
+        if d:
+            return d
+
+    b1, curves = _ECM_SCHEDULE[0]
+    schedule = list(_ECM_SCHEDULE)
+    while True:
+        if schedule:
+            b1, curves = schedule.pop(0)
+        else:
+            b1 *= 2
+        for _ in range(curves):
+            d = _ecm_curve(n, b1, rng)
+            if d:
+                return d
+
+
+def _perfect_power_root(n):
+    """Return r if n == r**k for some k >= 2, otherwise None."""
+    for k in small_primes(n.bit_length()):
+        r = _iroot(n, k)
+        if r ** k == n:
+            return r
+    return None
+
+
+def _iroot(n, k):
+    """Largest integer r with r**k <= n (Newton's method on integers)."""
+    if n < 2:
+        return n
+    r = 1 << -(-n.bit_length() // k)  # Power of two above the real root
+    while True:
+        s = ((k - 1) * r + n // r ** (k - 1)) // k
+        if s >= r:
+            return r
+        r = s
+
+
+def _pollard_brent(n, y, c):
+    """
+    Brent's variant of Pollard's rho with f(x) = x*x + c.
+
+    Returns a non-trivial factor of n, or None if this polynomial failed
+    or ran out of iterations.
+    """
+    m = 128  # Differences multiplied together before each gcd
+    g = r = q = 1
+    x = ys = y
+    while g == 1:
+        x = y
+        for _ in range(r):
+            y = (y * y + c) % n
+        k = 0
+        while k < r and g == 1:
+            ys = y
+            for _ in range(min(m, r - k)):
+                y = (y * y + c) % n
+                q = q * abs(x - y) % n
+            g = gcd(q, n)
+            k += m
+        r *= 2
+        if r > _RHO_ITERATIONS:
+            return None
+
+    if g == n:
+        # The batched product overshot; retrace one step at a time
+        while True:
+            ys = (ys * ys + c) % n
+            g = gcd(abs(x - ys), n)
+            if g > 1:
+                break
+    return g if g != n else None
+
+
+def _ecm_curve(n, b1, rng):
+    """
+    Run one Montgomery-curve ECM trial with stage-1 bound b1.
+
+    Returns a non-trivial factor of n, or None if this curve found nothing.
+    """
+    # Suyama's parametrization gives a curve whose group order is divisible
+    # by 12, together with a starting point on it
+    sigma = rng.randrange(6, n - 1)
+    u = (sigma * sigma - 5) % n
+    v = 4 * sigma % n
+    x, z = pow(u, 3, n), pow(v, 3, n)
+    denominator = 16 * pow(u, 3, n) * v % n
+    g = gcd(denominator, n)
+    if g != 1:
+        return g if g != n else None
+    a24 = pow(v - u, 3, n) * (3 * u + v) * pow(denominator, -1, n) % n
+
+    # Stage 1: multiply the point by every prime power up to b1
+    for p in _primes_upto(b1):
+        q = p
+        while q * p <= b1:
+            q *= p
+        x, z = _ladder(q, x, z, a24, n)
+    g = gcd(z, n)
+    if g != 1:
+        return g if g != n else None
+
+    # Stage 2: look for one more prime q in (b1, b2] with baby steps j*P
+    # (j coprime to the wheel) and giant steps m*D*P, since q*P == O
+    # exactly when m*D*P and j*P share an x-coordinate for q = m*D +- j
+    b2 = b1 * _ECM_B2_FACTOR
+    half = _ECM_D // 2
+    twice = _double(x, z, a24, n)
+    baby = {}
+    # x-only addition needs the difference: (j+2)P = jP + 2P with
+    # difference (j-2)P; -P and P share an x-coordinate, so start with P
+    prev = cur = (x, z)
+    for j in range(1, half, 2):
+        if gcd(j, _ECM_D) == 1:
+            baby[j] = cur
+        cur, prev = _add(cur, twice, prev, n), cur
+
+    giant = _ladder(_ECM_D, x, z, a24, n)
+    m = max(1, (b1 + half) // _ECM_D)
+    r_cur = _ladder(m * _ECM_D, x, z, a24, n)
+    r_next = _ladder((m + 1) * _ECM_D, x, z, a24, n)
+    primes = _primes_upto(b2)
+    i = bisect_right(primes, m * _ECM_D - half)
+    product = 1
+    while i < len(primes):
+        center = m * _ECM_D
+        xm, zm = r_cur
+        while i < len(primes) and primes[i] < center + half:
+            xj, zj = baby[abs(primes[i] - center)]
+            product = product * (xm * zj - xj * zm) % n
+            i += 1
+        r_cur, r_next = r_next, _add(r_next, giant, r_cur, n)
+        m += 1
+    g = gcd(product, n)
+    return g if 1 < g < n else None
+
+
+def _double(x, z, a24, n):
+    """x-only point doubling on a Montgomery curve."""
+    s = (x + z) * (x + z) % n
+    d = (x - z) * (x - z) % n
+    t = s - d
+    return s * d % n, t * (d + a24 * t) % n
+
+
+def _add(p, q, diff, n):
+    """x-only addition P + Q on a Montgomery curve, given P - Q."""
+    u = (p[0] - p[1]) * (q[0] + q[1])
+    v = (p[0] + p[1]) * (q[0] - q[1])
+    return diff[1] * (u + v) * (u + v) % n, diff[0] * (u - v) * (u - v) % n
+
+
+def _ladder(k, x, z, a24, n):
+    """Montgomery ladder: k times the point (x : z)."""
+    r0, r1 = (x, z), _double(x, z, a24, n)
+    for bit in bin(k)[3:]:
+        if bit == "1":
+            r0, r1 = _add(r1, r0, (x, z), n), _double(*r1, a24, n)
+        else:
+            r0, r1 = _double(*r0, a24, n), _add(r1, r0, (x, z), n)
+    return r0
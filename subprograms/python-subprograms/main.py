@@ -1,8 +1,76 @@
-from prime_checking import is_prime
+import argparse
+import sys
+from itertools import islice
 
-number = int(input("Enter a number: "))
+from prime_checking import is_prime, is_prime_many
 
-if is_prime(number):
-    print(f"{number} is a prime number.")
-else:
-    print(f"{number} is not a prime number.")
\ No newline at end of file
+
+def classify_stream(lines, out, primes_only=False, chunk_size=65536):
+    """
+    Classify newline-delimited integers chunk by chunk.
+
+    Each chunk is checked with one is_prime_many() call and written with a
+    single out.write(), so a large input costs a few calls per chunk rather
+    than a print() (or a whole process) per number. Blank lines are skipped;
+    a line that is not an integer is reported on stderr with its line
+    number and skipped, so one bad line does not stop the run.
+
+    Args:
+        lines: Iterable of text lines, e.g. sys.stdin or an open file
+        out: Writable text stream for the results
+        primes_only: Write only the primes, one per line
+        chunk_size: Number of lines read per batch
+    """
+    lines = iter(lines)
+    line_number = 0
+    while True:
+        chunk = list(islice(lines, chunk_size))
+        if not chunk:
+            break
+        numbers = []
+        for line_number, line in enumerate(chunk, line_number + 1):
+            if not line.strip():
+                continue
+            try:
+                numbers.append(int(line))
+            except ValueError:
+                print(f"line {line_number}: not an integer: {line.strip()!r}", file=sys.stderr)
+        results = is_prime_many(numbers)
+        if primes_only:
+            out.write("".join(f"{number}\n" for number, prime in zip(numbers, results) if prime))
+        else:
+            out.write("".join(
+                f"{number} is a prime number.\n" if prime else f"{number} is not a prime number.\n"
+                for number, prime in zip(numbers, results)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check whether numbers are prime.")
+    parser.add_argument("--batch", action="store_true",
+                        help="read newline-delimited integers instead of prompting")
+    parser.add_argument("file", nargs="?",
+                        help="input file for batch mode (default: stdin)")
+    parser.add_argument("--primes-only", action="store_true",
+                        help="in batch mode, write only the primes")
+    parser.add_argument("--chunk-size", type=int, default=65536,
+                        help="lines classified per batch (default: 65536)")
+    args = parser.parse_args()
+
+    if args.batch or args.file:
+        if args.file:
+            with open(args.file) as f:
+                classify_stream(f, sys.stdout, args.primes_only, args.chunk_size)
+        else:
+            classify_stream(sys.stdin, sys.stdout, args.primes_only, args.chunk_size)
+        return
+
+    number = int(input("Enter a number: "))
+
+    if is_prime(number):
+        print(f"{number} is a prime number.")
+    else:
+        print(f"{number} is not a prime number.")
+
+
+if __name__ == "__main__":
+    main()
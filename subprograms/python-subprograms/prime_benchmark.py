@@ -0,0 +1,216 @@
+"""
+Prime Checking Benchmarks
+=========================
+Timing scripts for the prime_checking module.
+
+Run "python prime_benchmark.py run" to time is_prime() over a fixed suite
+of inputs. "--save baseline.json" stores the results, and
+"--compare baseline.json --threshold 10" exits with status 1 if any case
+is more than 10% slower than the stored baseline.
+
+Run "python prime_benchmark.py scaling" to see how count_primes() speeds up
+as more worker processes are added.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+from prime_checking import count_primes, is_prime, small_primes
+
+
+def time_call(func, *args, **kwargs):
+    """
+    Run func once and measure it.
+
+    Returns:
+        tuple: (seconds taken, value returned by func)
+    """
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def scaling(lo, hi, max_workers):
+    """
+    Time count_primes(lo, hi) for 1..max_workers worker processes.
+
+    Returns:
+        list: One (workers, seconds, speed-up) tuple per worker count,
+        where speed-up is measured against the single-process run
+    """
+    rows = []
+    baseline = expected = None
+    for workers in range(1, max_workers + 1):
+        seconds, count = time_call(count_primes, lo, hi, workers=workers)
+        if baseline is None:
+            baseline, expected = seconds, count
+        elif count != expected:
+            raise RuntimeError(f"{workers} workers counted {count} primes, "
+                               f"1 worker counted {expected}")
+        rows.append((workers, seconds, baseline / seconds))
+    return rows
+
+
+def suite_cases():
+    """
+    Build the inputs for each benchmark case.
+
+    Every case is a fixed list of integers so that runs on different days
+    time exactly the same work.
+
+    Returns:
+        dict: {case name: list of integers passed to is_prime()}
+    """
+    large_primes = [2 ** 31 - 1, 4294967291, 1000000000039, 2 ** 61 - 1]
+    return {
+        # Everything the trial-division table settles on its own
+        "small": list(range(1, 10001)),
+        # Around the 32-bit signed limit: first Miller-Rabin tiers
+        "near_2^31": list(range(2 ** 31 - 5000, 2 ** 31 + 5000)),
+        # Around 2**63: the full 64-bit witness set for every survivor
+        "near_2^63": list(range(2 ** 63 - 2000, 2 ** 63 + 2000)),
+        # A dense run of consecutive integers, as a range scan would see
+        "dense_range": list(range(10 ** 9, 10 ** 9 + 20000)),
+        # Inputs that pass cheap filters: squares of primes, Carmichael
+        # numbers and strong pseudoprimes to small bases
+        "adversarial": [p * p for p in large_primes]
+                       + [p * q for p in large_primes for q in large_primes if p < q]
+                       + [561, 41041, 825265, 321197185, 5394826801,
+                          2047, 1373653, 25326001, 3215031751,
+                          2152302898747, 3474749660383, 341550071728321,
+                          3825123056546413051]
+                       + small_primes(100000)[-200:],
+    }
+
+
+def time_case(values, repeats, warmup):
+    """
+    Time is_prime() over values several times.
+
+    Args:
+        values: The integers to check
+        repeats: Number of timed passes
+        warmup: Number of untimed passes run first
+
+    Returns:
+        dict: Timing distribution of one pass, in seconds
+    """
+    for _ in range(warmup):
+        for n in values:
+            is_prime(n)
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for n in values:
+            is_prime(n)
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return {
+        "inputs": len(values),
+        "min": samples[0],
+        "median": statistics.median(samples),
+        "mean": statistics.fmean(samples),
+        "max": samples[-1],
+        "stdev": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        "samples": samples,
+    }
+
+
+def run_suite(repeats=7, warmup=2):
+    """
+    Time every case of suite_cases().
+
+    Returns:
+        dict: Results plus the machine details needed to judge a baseline
+    """
+    return {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "repeats": repeats,
+        "warmup": warmup,
+        "cases": {name: time_case(values, repeats, warmup)
+                  for name, values in suite_cases().items()},
+    }
+
+
+def compare(results, baseline, threshold):
+    """
+    Find cases whose median got slower than the baseline allows.
+
+    Args:
+        results: Output of run_suite()
+        baseline: A previously saved run_suite() result
+        threshold: Allowed slowdown in percent
+
+    Returns:
+        list: (case, baseline median, new median, percent change) for each
+        case that is more than threshold percent slower
+    """
+    regressions = []
+    for name, case in results["cases"].items():
+        old = baseline["cases"].get(name)
+        if old is None:
+            continue
+        change = (case["median"] / old["median"] - 1) * 100
+        if change > threshold:
+            regressions.append((name, old["median"], case["median"], change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="time is_prime() over the benchmark suite")
+    run.add_argument("--repeats", type=int, default=7)
+    run.add_argument("--warmup", type=int, default=2)
+    run.add_argument("--save", metavar="FILE", help="write the results as a JSON baseline")
+    run.add_argument("--compare", metavar="FILE", help="JSON baseline to check against")
+    run.add_argument("--threshold", type=float, default=10.0,
+                     help="allowed slowdown in percent (default: 10)")
+
+    scale = commands.add_parser("scaling", help="count_primes() speed-up per worker count")
+    scale.add_argument("--lo", type=int, default=10 ** 12)
+    scale.add_argument("--hi", type=int, default=10 ** 12 + 10 ** 9)
+    scale.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+
+    args = parser.parse_args()
+
+    if args.command == "run":
+        results = run_suite(args.repeats, args.warmup)
+        print(f"{'case':<12}  {'inputs':>6}  {'median ms':>9}  {'min ms':>8}  {'stdev ms':>8}")
+        for name, case in results["cases"].items():
+            print(f"{name:<12}  {case['inputs']:>6}  {case['median'] * 1e3:>9.2f}  "
+                  f"{case['min'] * 1e3:>8.2f}  {case['stdev'] * 1e3:>8.2f}")
+
+        if args.save:
+            with open(args.save, "w") as f:
+                json.dump(results, f, indent=2)
+            print(f"Saved baseline to {args.save}")
+
+        if args.compare:
+            with open(args.compare) as f:
+                baseline = json.load(f)
+            regressions = compare(results, baseline, args.threshold)
+            for name, old, new, change in regressions:
+                print(f"REGRESSION {name}: {old * 1e3:.2f} ms -> {new * 1e3:.2f} ms "
+                      f"(+{change:.1f}%)")
+            if regressions:
+                sys.exit(1)
+            print(f"No case is more than {args.threshold:g}% slower than {args.compare}")
+
+    elif args.command == "scaling":
+        print(f"Counting primes in [{args.lo}, {args.hi})")
+        print(f"{'workers':>7}  {'seconds':>9}  {'speed-up':>8}  {'efficiency':>10}")
+        for workers, seconds, speedup in scaling(args.lo, args.hi, args.max_workers):
+            print(f"{workers:>7}  {seconds:>9.3f}  {speedup:>7.2f}x  {speedup / workers:>10.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Prime Server Load Generator
+===========================
+Opens several connections to prime_server.py, keeps a window of pipelined
+requests in flight on each, and reports throughput and latency
+percentiles.
+
+Usage: python prime_loadgen.py --port 8765 --connections 32 --requests 20000
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+
+
+async def run_connection(open_connection, requests, pipeline, max_n, latencies):
+    """Send requests on one connection with up to pipeline of them in flight."""
+    reader, writer = await open_connection()
+    sent_at = {}
+    window = asyncio.Semaphore(pipeline)
+
+    async def send():
+        for request_id in range(requests):
+            await window.acquire()
+            n = random.randrange(max_n)
+            sent_at[request_id] = time.perf_counter()
+            writer.write(json.dumps({"id": request_id, "n": n}).encode() + b"\n")
+            await writer.drain()
+
+    sender = asyncio.create_task(send())
+    for _ in range(requests):
+        line = await reader.readline()
+        if not line:
+            raise ConnectionError("server closed the connection early")
+        response = json.loads(line)
+        if "error" in response:
+            raise RuntimeError(response["error"])
+        latencies.append(time.perf_counter() - sent_at.pop(response["id"]))
+        window.release()
+    await sender
+    writer.close()
+
+
+def percentile(sorted_values, fraction):
+    """Value below which the given fraction of sorted_values falls."""
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+
+async def run_load(args):
+    if args.unix:
+        def open_connection():
+            return asyncio.open_unix_connection(args.unix)
+    else:
+        def open_connection():
+            return asyncio.open_connection(args.host, args.port)
+
+    per_connection = args.requests // args.connections
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(run_connection(open_connection, per_connection, args.pipeline,
+                                          args.max_n, latencies)
+                           for _ in range(args.connections)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    print(f"{len(latencies)} requests over {args.connections} connections "
+          f"in {elapsed:.2f}s")
+    print(f"throughput: {len(latencies) / elapsed:,.0f} requests/s")
+    print(f"latency p50: {percentile(latencies, 0.50) * 1e3:.2f} ms  "
+          f"p99: {percentile(latencies, 0.99) * 1e3:.2f} ms  "
+          f"max: {latencies[-1] * 1e3:.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test prime_server.py.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", metavar="PATH", help="connect to a Unix socket instead")
+    parser.add_argument("--connections", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=20000, help="total requests")
+    parser.add_argument("--pipeline", type=int, default=64,
+                        help="requests in flight per connection")
+    parser.add_argument("--max-n", type=int, default=10 ** 12,
+                        help="requests ask about random n below this")
+    asyncio.run(run_load(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
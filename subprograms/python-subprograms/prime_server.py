@@ -0,0 +1,220 @@
+"""
+Prime Checking Server
+=====================
+Asyncio server that answers "is n prime?" over TCP or a Unix socket.
+
+Protocol: one JSON object per line in each direction.
+    request:  {"id": 7, "n": 1000003}
+    response: {"id": 7, "n": 1000003, "prime": true}
+Bad requests get {"id": ..., "error": "..."} instead, and so does any n
+of more than MAX_BITS bits (checking one that size takes about a second).
+Clients may pipeline any number of requests; responses come back in
+request order. A connection stops being read while MAX_PENDING of its
+requests are unanswered or its replies are not being read, so a client
+that never reads cannot make the server buffer without limit.
+
+Requests from all connections that arrive within a short window are
+checked together as one batch. Small batches of small numbers run inline
+on the event loop; a batch that is big, or holds any n wider than 64
+bits, is handed to a process pool (or a thread when there is no pool) so
+the loop keeps accepting requests while it is checked.
+
+Usage: python prime_server.py --port 8765
+       python prime_server.py --unix /tmp/primes.sock
+"""
+
+import argparse
+import asyncio
+import json
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from prime_checking import is_prime_many
+
+# Widest n accepted, in bits
+MAX_BITS = 4096
+
+# Unanswered requests per connection before the server stops reading it
+MAX_PENDING = 1024
+
+
+def check_batch(values):
+    """Classify a batch of integers; returns plain bools so they pickle cheaply."""
+    return [bool(prime) for prime in is_prime_many(values)]
+
+
+class PrimeBatcher:
+    """
+    Collects prime checks from many clients and runs them in batches.
+
+    The first request of a batch starts a timer; everything that arrives
+    before it fires (or before max_batch requests pile up) is checked with
+    a single is_prime_many() call. Only batches of fewer than
+    pool_threshold values, none wider than inline_bits, are checked on the
+    event loop itself.
+    """
+
+    def __init__(self, pool=None, window=0.002, max_batch=4096, pool_threshold=256,
+                 inline_bits=64):
+        self.pool = pool
+        self.window = window
+        self.max_batch = max_batch
+        self.pool_threshold = pool_threshold
+        self.inline_bits = inline_bits
+        self._values = []
+        self._futures = []
+        self._timer = None
+
+    def submit(self, n):
+        """Queue n for checking; returns a future that resolves to a bool."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._values.append(n)
+        self._futures.append(future)
+        if len(self._values) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        values, futures = self._values, self._futures
+        self._values, self._futures = [], []
+        if values:
+            asyncio.get_running_loop().create_task(self._run(values, futures))
+
+    async def _run(self, values, futures):
+        try:
+            # A single wide n can cost more than thousands of small ones
+            if len(values) < self.pool_threshold and \
+                    max(n.bit_length() for n in values) <= self.inline_bits:
+                results = check_batch(values)
+            else:
+                loop = asyncio.get_running_loop()
+                results = await loop.run_in_executor(self.pool, check_batch, values)
+        except Exception as error:
+            for future in futures:
+                if not future.done():
+                    future.set_exception(error)
+            return
+        for future, result in zip(futures, results):
+            if not future.done():
+                future.set_result(result)
+
+
+async def handle_client(reader, writer, batcher):
+    """Serve one connection: read pipelined requests, answer them in order."""
+    pending = deque()
+    ready = asyncio.Event()
+    space = asyncio.Event()  # Set while pending is below MAX_PENDING
+    space.set()
+    done_reading = False
+
+    async def respond():
+        # Await each answer in request order and write it out
+        try:
+            while True:
+                while not pending:
+                    if done_reading:
+                        return
+                    ready.clear()
+                    await ready.wait()
+                request_id, n, answer = pending.popleft()
+                if len(pending) < MAX_PENDING:
+                    space.set()
+                if isinstance(answer, str):
+                    response = {"id": request_id, "error": answer}
+                else:
+                    try:
+                        response = {"id": request_id, "n": n, "prime": await answer}
+                    except Exception as error:
+                        response = {"id": request_id, "error": str(error)}
+                writer.write(json.dumps(response).encode() + b"\n")
+                # Waits only while the client is not reading (buffer above
+                # the transport's high-water mark)
+                await writer.drain()
+        finally:
+            space.set()  # Never leave the reader waiting on a dead responder
+
+    responder = asyncio.create_task(respond())
+    try:
+        async for line in reader:
+            if not line.strip():
+                continue
+            request_id = None
+            try:
+                request = json.loads(line)
+                request_id = request.get("id")
+                n = request["n"]
+                if not isinstance(n, int) or isinstance(n, bool):
+                    raise ValueError
+            except (ValueError, KeyError, AttributeError):
+                pending.append((request_id, None, "expected {\"id\": ..., \"n\": <integer>}"))
+            else:
+                if n.bit_length() > MAX_BITS:
+                    pending.append((request_id, None, f"n is wider than {MAX_BITS} bits"))
+                else:
+                    pending.append((request_id, n, batcher.submit(n)))
+            ready.set()
+            if len(pending) >= MAX_PENDING:
+                space.clear()
+                await space.wait()
+                if responder.done():
+                    break
+    finally:
+        done_reading = True
+        ready.set()
+        try:
+            await responder
+        except ConnectionError:
+            pass  # Client went away before reading every answer
+        writer.close()
+
+
+async def serve(host, port, unix_path, workers, window, max_batch):
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 0 else None
+    batcher = PrimeBatcher(pool, window=window, max_batch=max_batch)
+
+    async def on_connect(reader, writer):
+        await handle_client(reader, writer, batcher)
+
+    if unix_path:
+        server = await asyncio.start_unix_server(on_connect, path=unix_path)
+        where = unix_path
+    else:
+        server = await asyncio.start_server(on_connect, host, port)
+        where = f"{host}:{port}"
+    print(f"Prime server listening on {where}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve prime checks over a socket.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", metavar="PATH", help="listen on a Unix socket instead of TCP")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="process-pool size for big batches (0 = use a thread)")
+    parser.add_argument("--window", type=float, default=0.002,
+                        help="seconds to wait for more requests before checking a batch")
+    parser.add_argument("--max-batch", type=int, default=4096)
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(serve(args.host, args.port, args.unix, args.workers,
+                          args.window, args.max_batch))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()